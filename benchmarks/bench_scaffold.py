@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Throughput benchmark for the scaffold engine.
+
+Builds experiments into a temporary master folder through a stand-in for the
+local filesystem that sleeps a fixed time before every call, the way a
+network share answers each mkdir, create and rename with a round trip. Use
+--latency 0 to measure the engine itself.
+
+Each scenario is run for a single experiment and for a batch:
+    fresh         build a new experiment directly in the master folder
+    repair        re-run on a complete experiment, nothing is created
+    staged        build in a staging folder on the same volume, publish with one rename
+    staged-cross  build in --staging-folder on another volume, publish by copying
+                  to a hidden folder and renaming it into place (the network share case)
+
+    python benchmarks/bench_scaffold.py --latency 5 --batch 32 --workers 8
+    python benchmarks/bench_scaffold.py --root /dev/shm --staging-folder /tmp --scenario staged-cross
+
+The default --root is /dev/shm and the default --staging-folder the system
+temp folder, which are different volumes on most Linux machines. The publish
+method actually used is printed with each staged result.
+
+Results are printed and appended to bench_output.txt in the repository root.
+'''
+
+# import liberaries
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+# define constants
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+OUTPUT_FILE = REPO_FOLDER.joinpath('bench_output.txt')
+SCENARIOS = ('fresh', 'repair', 'staged', 'staged-cross')
+
+sys.path.insert(0, str(REPO_FOLDER))
+from scaffold import DEFAULT_WORKERS, Experiment, LocalFS, build_batch, build_experiment  # noqa: E402
+
+
+class LatencyFS(LocalFS):
+    '''LocalFS that waits latency seconds before each call and counts the calls.'''
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.counts[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def mkdir(self, path):
+        self._call('mkdir')
+        super().mkdir(path)
+
+    def place(self, templates, name, target):
+        self._call('place')
+        return super().place(templates, name, target)
+
+    def write_text(self, target, text):
+        self._call('write')
+        super().write_text(target, text)
+
+    def scandir(self, path):
+        self._call('scandir')
+        return super().scandir(path)
+
+    def isdir(self, path):
+        self._call('isdir')
+        return super().isdir(path)
+
+    def rename(self, source, target):
+        self._call('rename')
+        super().rename(source, target)
+
+    def copytree(self, source, target):
+        # a copy across volumes is one call per folder and file
+        self._call('copytree')
+        for _, folders, files in os.walk(source):
+            for _ in folders + files:
+                self._call('copytree')
+        super().copytree(source, target)
+
+
+def default_root():
+    '''Prefers tmpfs so the disk does not add its own latency.'''
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def publish_method(staging, master):
+    '''How a staged tree reaches the master folder: one rename on the same volume, else a copy.'''
+    return 'rename' if os.stat(staging).st_dev == os.stat(master).st_dev else 'copy'
+
+
+def run(scenario, count, workers, latency, root, staging_folder):
+    '''Builds count experiments with the default profile. Returns (seconds, operations, errors, publish method).'''
+    with tempfile.TemporaryDirectory(prefix='bench-scaffold-', dir=root) as folder, \
+            tempfile.TemporaryDirectory(prefix='bench-staging-', dir=staging_folder) as cross_staging:
+        master = Path(folder).joinpath('master')
+        master.mkdir()
+        staging = Path(cross_staging if scenario == 'staged-cross' else folder).joinpath('staging')
+        staging.mkdir()
+        experiments = [Experiment(str(master), '2026-01-01', f'bench {index:04d}') for index in range(count)]
+        if scenario == 'repair':
+            build_batch(experiments, workers=workers)
+
+        fs = LatencyFS(latency)
+        stage = scenario.startswith('staged')
+        start = time.perf_counter()
+        if count == 1:
+            results = [build_experiment(experiments[0], stage=stage, staging_folder=staging, fs=fs)]
+        else:
+            results = build_batch(experiments, workers=workers, stage=stage, staging_folder=staging, fs=fs)
+        seconds = time.perf_counter() - start
+        errors = [error for result in results for error in result.errors]
+        return seconds, sum(fs.counts.values()), errors, publish_method(staging, master) if stage else None
+
+
+def summary(scenario, count, seconds, operations, errors, method):
+    return (f'{scenario:>12} x{count:<4} {seconds * 1e3:9.1f} ms  {operations:6d} ops  '
+            f'{count / seconds:8.1f} experiments/s  {operations / seconds:9.0f} ops/s'
+            + (f'  publish={method}' if method else '')
+            + (f'  {len(errors)} errors, first: {errors[0]}' if errors else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure scaffold engine throughput with injected filesystem latency.')
+    parser.add_argument('--latency', type=float, default=2.0, help='milliseconds added to every filesystem call')
+    parser.add_argument('--batch', type=int, default=16, help='number of experiments in the batch runs')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='threads used for batch builds')
+    parser.add_argument('--root', default=default_root(), help='folder the temporary master folder is made in')
+    parser.add_argument('--staging-folder', default=tempfile.gettempdir(),
+                        help='folder staged-cross builds in, on another volume than --root')
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='scenario to run, default all')
+    parser.add_argument('--output', default=str(OUTPUT_FILE), help='file the results are appended to')
+    args = parser.parse_args(argv)
+
+    lines = [f'# scaffold {datetime.now().isoformat(timespec="seconds")} latency={args.latency} ms '
+             f'batch={args.batch} workers={args.workers} root={args.root or tempfile.gettempdir()} '
+             f'staging-folder={args.staging_folder}']
+    print(lines[0])
+    for scenario in args.scenario or SCENARIOS:
+        for count in (1, args.batch):
+            line = summary(scenario, count, *run(scenario, count, args.workers, args.latency / 1e3, args.root,
+                                                 args.staging_folder))
+            print(line)
+            lines.append(line)
+    with open(args.output, 'a') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Startup-time benchmark for experiment_start.py.
+
+Launches the GUI in a fresh interpreter several times. With the
+EXPERIMENT_START_BENCHMARK variable set, the GUI writes the time from its
+first line to the first painted window and closes itself. The wall time of
+the whole process, interpreter start included, is measured here as well.
+
+    python benchmarks/bench_startup.py --runs 10
+
+Results are printed and appended to bench_output.txt in the repository root.
+'''
+
+# import liberaries
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+from pathlib import Path
+
+# define constants
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+GUI_SCRIPT = REPO_FOLDER.joinpath('experiment_start.py')
+OUTPUT_FILE = REPO_FOLDER.joinpath('bench_output.txt')
+
+
+def time_startup(runs):
+    '''Returns lists of time to first window and total process time in seconds.'''
+    first_window = []
+    process = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as folder:
+            report = Path(folder).joinpath('startup.txt')
+            env = dict(os.environ, EXPERIMENT_START_BENCHMARK=str(report))
+            start = time.perf_counter()
+            subprocess.run([sys.executable, str(GUI_SCRIPT)], cwd=REPO_FOLDER, env=env, check=True)
+            process.append(time.perf_counter() - start)
+            first_window.append(float(report.read_text().split()[-1]))
+    return first_window, process
+
+
+def summary(name, times):
+    return (f'{name}: median {statistics.median(times) * 1e3:.1f} ms, '
+            f'min {min(times) * 1e3:.1f} ms, max {max(times) * 1e3:.1f} ms')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure experiment_start.py time to first window.')
+    parser.add_argument('--runs', type=int, default=5, help='number of GUI launches')
+    parser.add_argument('--output', default=str(OUTPUT_FILE), help='file the results are appended to')
+    args = parser.parse_args(argv)
+
+    first_window, process = time_startup(args.runs)
+    lines = [f'# startup {datetime.now().isoformat(timespec="seconds")} runs={args.runs}',
+             summary('time to first window', first_window),
+             summary('process start to exit', process)]
+    print('\n'.join(lines))
+    with open(args.output, 'a') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
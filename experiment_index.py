@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Persistent index of the "<date> - <name>" experiments under a master folder.
+
+The index is a SQLite file kept on the local disk, one per master folder, so
+it is never locked or corrupted by a network share. A refresh lists the
+master folder once and only rescans experiments whose folder mtime changed.
+Name collision checks and searches then never touch the share.
+'''
+
+# import liberaries
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from collections import namedtuple
+from pathlib import Path
+
+# define constants
+KERNAL_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}) - (.+)$')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS experiments (
+    kernal TEXT PRIMARY KEY,
+    folded TEXT NOT NULL,
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    structure TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS experiments_folded ON experiments (folded);
+'''
+
+Record = namedtuple('Record', ['kernal', 'date', 'name', 'structure', 'file_count', 'mtime_ns'])
+
+
+def default_index_folder():
+    '''Returns the per-user folder index files are kept in.'''
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home().joinpath('.cache')
+    return Path(base).joinpath('build_experiment_file_structure')
+
+
+def scan_experiment(path):
+    '''
+    Walks one experiment with one os.scandir per folder. Returns the sorted
+    relative folder paths and the number of files.
+    '''
+    structure = []
+    file_count = 0
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        with os.scandir(os.path.join(path, relative)) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    child = f'{relative}/{entry.name}' if relative else entry.name
+                    structure.append(child)
+                    pending.append(child)
+                else:
+                    file_count += 1
+    return sorted(structure), file_count
+
+
+class ExperimentIndex:
+    '''Index of the experiments in one master folder.'''
+
+    def __init__(self, master_folder, index_file=None):
+        self.master_folder = Path(master_folder)
+        if index_file is None:
+            key = hashlib.sha1(os.path.normcase(os.path.abspath(master_folder)).encode()).hexdigest()[:16]
+            index_file = default_index_folder().joinpath(f'index-{key}.sqlite')
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.index_file), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        # folded kernal names, kept in memory for instant collision checks
+        self._folded = {row[0] for row in self._db.execute('SELECT folded FROM experiments')}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def refresh(self, full=False):
+        '''
+        Brings the index up to date. Lists the master folder once and rescans
+        only experiments that are new or whose folder mtime changed. A folder
+        mtime only changes when its direct children do, so use full=True to
+        recount files added deeper in every experiment.
+        Returns the number of (added, updated, removed) experiments.
+        '''
+        with self._lock:
+            known = dict(self._db.execute('SELECT kernal, mtime_ns FROM experiments'))
+
+        seen = set()
+        changes = []
+        with os.scandir(self.master_folder) as entries:
+            for entry in entries:
+                match = KERNAL_PATTERN.match(entry.name)
+                if match is None or not entry.is_dir():
+                    continue
+                seen.add(entry.name)
+                mtime_ns = entry.stat().st_mtime_ns
+                if not full and known.get(entry.name) == mtime_ns:
+                    continue
+                try:
+                    structure, file_count = scan_experiment(entry.path)
+                except OSError:
+                    continue
+                changes.append((entry.name, entry.name.casefold(), match.group(1), match.group(2),
+                                mtime_ns, json.dumps(structure), file_count, time.time()))
+
+        removed = [(kernal,) for kernal in known if kernal not in seen]
+        added = sum(1 for change in changes if change[0] not in known)
+        with self._lock:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO experiments VALUES (?, ?, ?, ?, ?, ?, ?, ?)', changes)
+                self._db.executemany('DELETE FROM experiments WHERE kernal = ?', removed)
+            self._folded = {row[0] for row in self._db.execute('SELECT folded FROM experiments')}
+        return added, len(changes) - added, len(removed)
+
+    def exists(self, kernal):
+        '''True if an experiment with this kernal name is indexed. Ignores case like Windows does.'''
+        return kernal.casefold() in self._folded
+
+    def get(self, kernal):
+        with self._lock:
+            row = self._db.execute('SELECT kernal, date, name, structure, file_count, mtime_ns '
+                                   'FROM experiments WHERE folded = ?', (kernal.casefold(),)).fetchone()
+        return _record(row) if row else None
+
+    def search(self, text, limit=50):
+        '''Returns experiments whose kernal name contains text, newest first.'''
+        pattern = '%' + text.casefold().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self._lock:
+            rows = self._db.execute('SELECT kernal, date, name, structure, file_count, mtime_ns '
+                                    "FROM experiments WHERE folded LIKE ? ESCAPE '\\' "
+                                    'ORDER BY date DESC, kernal LIMIT ?', (pattern, limit)).fetchall()
+        return [_record(row) for row in rows]
+
+    def __len__(self):
+        return len(self._folded)
+
+
+def _record(row):
+    kernal, date, name, structure, file_count, mtime_ns = row
+    return Record(kernal, date, name, tuple(json.loads(structure)), file_count, mtime_ns)
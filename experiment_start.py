@@ -4,18 +4,24 @@
 
 
 # import liberaries 
+# tkcalendar and ttkwidgets are slow to import, so they are imported on first
+# use in open_calendar() and add_tip() to get the window on screen sooner.
+import time
+START_TIME = time.perf_counter()
+
 import os
+import queue
 import tkinter as tk
-import shutil
 import subprocess
+import threading
 
 from datetime import datetime
 from pathlib import Path
-from PIL import ImageTk, Image
 from tkinter import ttk
-from tkcalendar import Calendar, DateEntry
 from tkinter.filedialog import askdirectory
-from ttkwidgets.frames import Balloon
+
+import scaffold
+import structure_profiles
 
 # define custom functions
 
@@ -25,144 +31,219 @@ def ask_main_folder():
                              initialdir = master_folder.get(),
                              title='Select Plot Folder')
     master_folder.set(path)
+    refresh_index()
 
 def save_date(d):
     ''' formats and updates the selected date as a string. '''
     ''' d is place holder for auto update code to work. '''
-    date_string.set(cal.get_date().strftime("%Y-%m-%d"))
-    kernal_name.set(''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')]))
+    date_string.set(cal.selection_get().strftime("%Y-%m-%d"))
+    kernal_name.set(scaffold.make_kernal_name(date_string.get(), experiment_name.get()))
+    calendar_window.withdraw()
+
+def open_calendar(event=None):
+    ''' shows the calendar under the date field. Builds it on first use. '''
+    global cal, calendar_window
+    if calendar_window is None:
+        from tkcalendar import Calendar
+        calendar_window = tk.Toplevel(root)
+        calendar_window.overrideredirect(True)
+        cal = Calendar(calendar_window, date_pattern='y-mm-dd',
+                       selectmode='day', year=int(date_string.get()[:4]),
+                       month=int(date_string.get()[5:7]), day=int(date_string.get()[8:10]))
+        cal.pack()
+        cal.bind("<<CalendarSelected>>", save_date)  # update date everytime a day is selected on calendar.
+        calendar_window.bind("<FocusOut>", lambda e: calendar_window.withdraw())
+    calendar_window.geometry(f'+{date_entry.winfo_rootx()}+{date_entry.winfo_rooty() + date_entry.winfo_height()}')
+    calendar_window.deiconify()
+    calendar_window.lift()
+    calendar_window.focus_set()
+
+def add_tip(widget, text):
+    ''' attaches a Balloon tool tip that is only built when the mouse first enters the widget. '''
+    def build_tip(event):
+        from ttkwidgets.frames import Balloon
+        # Balloon binds <Enter> itself, replacing this one-shot binding
+        Balloon(widget, headertext=tip_text_header, text=text, background=None, image=None)
+        widget.event_generate('<Enter>')
+    widget.bind('<Enter>', build_tip)
+
+def build_tab(event):
+    ''' builds the Folders and Files tabs the first time they are selected. '''
+    tab = nb.nametowidget(nb.select())
+    if tab in tab_builders and tab not in built_tabs:
+        built_tabs.add(tab)
+        show_tab_frame(tab)
+
+def report_startup():
+    ''' benchmark hook. Records time to first window and closes the GUI. '''
+    root.update()
+    elapsed = time.perf_counter() - START_TIME
+    with open(os.environ['EXPERIMENT_START_BENCHMARK'], 'a') as file:
+        file.write(f'{elapsed:.6f}\n')
+    root.destroy()
 
 def save_exp_name(n):
     ''' formats and updates the selected name as a string. '''
     ''' n is place holder for auto update code to work. '''
     experiment_name.set(experiment_name.get().replace(' ', '_'))
-    kernal_name.set(''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')]))
+    kernal_name.set(scaffold.make_kernal_name(date_string.get(), experiment_name.get()))
+
+def refresh_index():
+    ''' refreshes the experiment index of the master folder on a background thread. '''
+    folder = master_folder.get()
+    if experiment_index is not None and str(experiment_index.master_folder) != str(Path(folder)):
+        # the old index would give wrong warnings until the new one is ready
+        set_experiment_index(None)
+
+    def run():
+        import sqlite3
+        from experiment_index import ExperimentIndex
+        try:
+            index = experiment_index
+            if index is None or str(index.master_folder) != str(Path(folder)):
+                index = ExperimentIndex(folder)
+            index.refresh()
+        except (OSError, sqlite3.Error) as error:
+            print(f'Could not index {folder}. {error}')
+            return
+        # poll_worker only uses the index if the master folder is still the same
+        worker.events.put(('indexed', folder, index))
+
+    threading.Thread(target=run, name='experiment-index', daemon=True).start()
+
+def check_collision(*args):
+    ''' warns when the kernal name is already used in the master folder. '''
+    kernal = scaffold.make_kernal_name(date_string.get(), experiment_name.get())
+    if experiment_index is not None and experiment_index.exists(kernal):
+        collision_text.set('An experiment with this name already exists.')
+    else:
+        collision_text.set('')
+
+def search_experiments(*args):
+    ''' lists the indexed experiments whose kernal name contains the search text. '''
+    global search_results
+    text = search_text.get().strip()
+    if experiment_index is None or not text:
+        search_results = {}
+    else:
+        search_results = {record.kernal: record for record in experiment_index.search(text, SEARCH_LIMIT)}
+    combo_search.configure(values=list(search_results))
+
+def show_search_result(event=None):
+    ''' reports the selected search result and shows its location. '''
+    record = search_results.get(search_text.get())
+    if record is None:
+        return
+    status_text.set(f'{record.kernal}: {record.file_count} files')
+    subprocess.Popen(f'explorer /select,{os.path.join(master_folder.get(), record.kernal)}\\')
+
+def make_profile_state(profile):
+    ''' creates the check box variables for a profile, set to its defaults. '''
+    state = {'profile': profile, 'frames': {}, 'folders': {}, 'custom': [], 'files': {}}
+    for option in profile.folders:
+        state['folders'][option.key] = tk.IntVar(value=int(option.default))
+    for name, default in profile.custom_folders:
+        state['custom'].append((tk.IntVar(value=int(default)), tk.StringVar(value=name)))
+    for option in profile.files:
+        state['files'][option.key] = tk.IntVar(value=int(option.default))
+    return state
+
+def select_profile(event=None):
+    ''' switches the Folders and Files tabs to the selected structure profile. '''
+    global current_state
+    name = profile_name.get()
+    if name not in profile_states:
+        try:
+            profile_states[name] = make_profile_state(structure_profiles.load_profile(name))
+        except (OSError, ValueError) as error:
+            status_text.set(f'Could not load profile {name}. {error}')
+            return
+    current_state = profile_states[name]
+    for tab in built_tabs:
+        show_tab_frame(tab)
+
+def show_tab_frame(tab):
+    ''' raises the current profile's frame on a tab, building it once. '''
+    frame = current_state['frames'].get(tab)
+    if frame is None:
+        frame = tk.Frame(tab)
+        frame.place(relx=0, rely=0, relwidth=1.0, relheight=1.0)
+        tab_builders[tab](frame, current_state)
+        current_state['frames'][tab] = frame
+    frame.tkraise()
+
+def gui_experiment():
+    '''Collects the GUI selections into an Experiment for the scaffold engine.'''
+    folders = [key for key, var in current_state['folders'].items() if var.get() == 1]
+    for var, name in current_state['custom']:
+        if var.get() == 1:
+            folders.append(name.get())
+    files = [key for key, var in current_state['files'].items() if var.get() == 1]
+    return scaffold.Experiment(master_folder=master_folder.get(),
+                               date=date_string.get(),
+                               name=experiment_name.get(),
+                               profile=profile_name.get(),
+                               folders=tuple(folders),
+                               files=tuple(files))
 
 def create_folders():
-    ''' function to create folder structure'''
-    path_master = Path(master_folder.get())
-    exp_kernal = ''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')])
-    folder = Path.joinpath(path_master,exp_kernal)
-    try:
-        Path.mkdir(Path.joinpath(path_master,exp_kernal))
-        subprocess.Popen(f'explorer /select,{folder}\\')
-    except FileExistsError: 
-        print(f'Folder exists. Showing location...')
-        subprocess.Popen(f'explorer /select,{folder}\\')
-    except:
-        print('Something went wrong.')
-    
-    make_folder_lists()
-    
-    for folder in list_folder_main:
+    ''' function to queue the folder structure build on the worker thread'''
+    worker.submit(gui_experiment(), stage=CV_stage.get() == 1)
+
+def cancel_build():
+    ''' function to stop the running build and clear the queue'''
+    worker.cancel()
+
+def set_experiment_index(index):
+    ''' makes index the experiment index of the master folder and updates the checks that use it. '''
+    global experiment_index
+    experiment_index = index
+    check_collision()
+    search_experiments()
+
+def poll_worker():
+    ''' function to show worker progress. Runs on the Tk main loop every POLL_MS.'''
+    while True:
         try:
-            Path.mkdir(Path.joinpath(path_master,exp_kernal,folder))
-        except FileExistsError: 
-            print(f'Folder exists.')
-        except:
-            print('Something went wrong.')
-        
-    for folder in list_folder_image_fmt:
-        try:
-            Path.mkdir(Path.joinpath(path_master,exp_kernal,'images',folder))
-        except FileExistsError: 
-            print(f'Folder exists.')
-        except:
-            print('Something went wrong.')
-    # make note files as appropriate
-    if CV_file_note.get() == 1:
-        create_note_file()
-    if CV_file_video.get() ==1:
-        copy_file_to_folder('video_scripts.txt', 'videos')
-    if CV_file_notebook.get() ==1:
-        copy_file_to_folder('_notebook.ipynb', 'notebooks')
-        rename_file('_notebook.ipynb', 'notebooks')
-    if CV_file_python.get() ==1:
-        copy_file_to_folder('_py_script.py', 'notebooks')
-        rename_file('_py_script.py', 'notebooks')
-    if CV_file_contact_angle.get() ==1:
-        copy_file_to_folder('optical_contact_angle_template.xlsx', 'notebooks')
-    if CV_file_pressure_transducer.get() ==1:
-        copy_file_to_folder('pressure_transducer_unit_conversion.xlsx', 'notebooks')    
-    if CV_file_exp_setup.get() ==1:
-        copy_file_to_folder('_exp_setup.svg', 'images/SVG')
-        rename_file('_exp_setup.svg', 'images/SVG')    
-    if CV_file_video.get() ==1:
-        copy_file_to_folder('concatenate.bat', 'videos')      
-    
-def make_folder_lists():
-    '''function returns lists of folders to create based on checkboxes'''
-    # initialize lists
-    global list_folder_main
-    global list_folder_image_fmt
-    list_folder_main = [ ]
-    list_folder_image_fmt = [ ]
-    
-    # main folders
-    if CV_data.get() == 1:
-        list_folder_main.append('data')
-    if CV_images.get() == 1:
-        list_folder_main.append('images')
-    if CV_notebooks.get() == 1:
-        list_folder_main.append('notebooks')
-    if CV_plots.get() == 1:
-        list_folder_main.append('plots')
-    if CV_videos.get() == 1:
-        list_folder_main.append('videos')
-    if CV_custom0.get() ==1:
-        list_folder_main.append(name_folder_custom_0.get())
-    if CV_custom1.get() ==1:
-        list_folder_main.append(name_folder_custom_1.get())
-    if CV_custom2.get() ==1:
-        list_folder_main.append(name_folder_custom_2.get())
-
-    # image format folders
-    if CV_images.get() == 1:
-        if CV_JPG.get() == 1:
-            list_folder_image_fmt.append('JPG')
-        if CV_NEF.get() == 1:
-            list_folder_image_fmt.append('NEF')
-        if CV_PNG.get() == 1:
-            list_folder_image_fmt.append('PNG')
-        if CV_SVG.get() == 1:
-            list_folder_image_fmt.append('SVG')      
-        
-def create_note_file():
-    path_master = Path(master_folder.get())
-    exp_kernal = ''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')])
-    file_folder = Path.joinpath(path_master,exp_kernal)
-    file_ext = '.txt'
-    file_name = ''.join([str(file_folder), '\\', exp_kernal, '_notes', file_ext])
-    file = open(f'{file_name}', 'w')
-    file.write(f'This is a note file for {exp_kernal}\nDate\t\tTime\t\tNotes\n{date_string.get()}\t\t\tFile Created')
-    file.close()
-    
-def copy_file_to_folder(file, folder):
-    local_file_name = file
-
-    local_file_location = Path(r'.\files')
-    local_file = Path.joinpath(local_file_location, local_file_name)
-
-    path_master = Path(master_folder.get())
-    exp_kernal = ''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')])
-    file_folder = Path.joinpath(path_master,exp_kernal, folder)
-    shutil.copy2(local_file, file_folder)
-
-def rename_file(file, folder):
-    og_file_name = file
-    path_master = Path(master_folder.get())
-    exp_kernal = ''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')])
-    new_file_name = ''.join([exp_kernal, og_file_name])
-    file_folder = Path.joinpath(path_master,exp_kernal, folder)
-    og_file = Path.joinpath(file_folder, og_file_name)
-    new_file = Path.joinpath(file_folder, new_file_name)
-    os.rename(og_file, new_file)    
+            event = worker.events.get_nowait()
+        except queue.Empty:
+            break
+        if event[0] == 'queued':
+            status_text.set(f'{event[2]} queued: {event[1].kernal}')
+        elif event[0] == 'progress':
+            _, experiment, done, total, description = event
+            progress_bar.configure(maximum=total, value=done)
+            status_text.set(f'{experiment.kernal}: {description}')
+        elif event[0] == 'done':
+            show_result(event[1])
+            refresh_index()
+        elif event[0] == 'indexed':
+            _, folder, index = event
+            # a refresh started for an earlier master folder is dropped
+            if folder == master_folder.get():
+                set_experiment_index(index)
+    root.after(POLL_MS, poll_worker)
+
+def show_result(result):
+    ''' function to report a finished build and show its location'''
+    if result.cancelled:
+        status_text.set(f'Cancelled: {result.experiment.kernal}')
+        return
+    if result.existing:
+        print(f'Folder exists. Showing location...')
+    for error in result.errors:
+        print(f'Something went wrong. {error}')
+    status_text.set(f'{"Done" if result.ok else "Done with errors"}: {result.experiment.kernal}')
+    if result.created or result.existing:
+        subprocess.Popen(f'explorer /select,{result.experiment.path}\\')
 
 # define constants
 HEIGHT = 420
 WIDTH = 520
 LOCX = 100
 LOCY = 50
+POLL_MS = 100
+SEARCH_LIMIT = 50
 
 # start GUI definition
 
@@ -187,55 +268,43 @@ master_folder = tk.StringVar()
 date_string = tk.StringVar()
 experiment_name = tk.StringVar()
 kernal_name = tk.StringVar()
+status_text = tk.StringVar()
+collision_text = tk.StringVar()
+search_text = tk.StringVar()
+CV_stage = tk.IntVar()
 
-# folder tab variables
-
-# experiment layer folder variables
-CV_data = tk.IntVar()
-CV_images = tk.IntVar()
-CV_notebooks = tk.IntVar()
-CV_plots = tk.IntVar()
-CV_videos = tk.IntVar()
-
-# image layer folder  variables
-CV_JPG = tk.IntVar()
-CV_NEF = tk.IntVar()
-CV_PNG = tk.IntVar()
-CV_SVG = tk.IntVar()
-
-# experiment layer custom folder variables
-CV_custom0 = tk.IntVar()
-CV_custom1 = tk.IntVar()
-CV_custom2 = tk.IntVar()
-name_folder_custom_0 = tk.StringVar()
-name_folder_custom_1 = tk.StringVar()
-name_folder_custom_2 = tk.StringVar()
-
-# files tab variables
-CV_file_note = tk.IntVar()
-CV_file_video = tk.IntVar()
-CV_file_notebook = tk.IntVar()
-CV_file_python = tk.IntVar()
-CV_file_contact_angle = tk.IntVar()
-CV_file_pressure_transducer = tk.IntVar()
-CV_file_exp_setup = tk.IntVar()
-CV_file_concat_video = tk.IntVar()
+# folders and files tab variables. Each structure profile gets its own set
+# of check box variables and tab frames the first time it is selected.
+profile_name = tk.StringVar()
+profile_states = {}
+current_state = None
 
 # Initialization of Tkinter variables 
 master_folder.set(r''.join([os.environ['USERPROFILE'],r'\Documents\01 - Local Work\00 - Titan\experiments']))
 date_string.set(datetime.today().strftime('%Y-%m-%d'))
 experiment_name.set('Enter name')
-kernal_name.set(''.join([date_string.get(), ' - ', experiment_name.get().replace(' ', '_')]))
+kernal_name.set(scaffold.make_kernal_name(date_string.get(), experiment_name.get()))
+profile_name.set(structure_profiles.DEFAULT_PROFILE)
+
+# the calendar is built on first use
+cal = None
+calendar_window = None
 
-name_folder_custom_0.set('literature')
-name_folder_custom_1.set('misc')
-name_folder_custom_2.set('zzz_obsolete')
+# the experiment index is opened on a background thread
+experiment_index = None
+search_results = {}
+experiment_name.trace_add('write', check_collision)
+date_string.trace_add('write', check_collision)
 
 # tool tip text. define text here and place later.
 tip_text_change_folder = 'Click to open file explorer box to select parent folder.'
 tip_text_create_structure = 'Click to create the experiment folder structure. Selected folders in the Folders tab will be created. Selected files in the Files tab will be created.'
+tip_text_cancel = 'Click to stop the running build and clear any queued builds.'
 tip_text_exit = 'Click to exit GUI.'
+tip_text_stage = 'Build the structure in a local temporary folder, then move it to the parent folder in one step. Faster on network drives, and a failed build leaves nothing behind.'
+tip_text_profile = 'Select the structure profile. It sets which folders and files are offered in the Folders and Files tabs. Profiles live in the profiles folder.'
 tip_text_date_select = 'Click to open calander to select experiment date.'
+tip_text_search = 'Type part of an experiment name to find experiments already in the parent folder. Select one to show its location.'
 tip_text_name_enter = 'Please enter a descriptive experiment name. Spaces will be replaced with \'_\'.'
 tip_text_header = 'Hidden Guidance'
 
@@ -266,6 +335,8 @@ nb.add(tab_files, text='Files')
 
 # put notebook on screen
 nb.pack(expand=True, fill=tk.BOTH)
+# the Folders and Files tabs are filled in the first time they are selected
+nb.bind('<<NotebookTabChanged>>', build_tab)
 
 #
 ########################################################################
@@ -297,7 +368,21 @@ label_folder_current.grid(row=1, column=2, padx=5, pady=5)
 button_change_folder = ttk.Button(frame_parent_folder, text='Change folder', command=ask_main_folder)
 button_change_folder.grid(row=1, column=3, padx=5, pady=5, sticky='NE') 
 # add tool tip for button
-Balloon(button_change_folder, headertext=tip_text_header, text=tip_text_change_folder, background=None, image=None)
+add_tip(button_change_folder, tip_text_change_folder)
+
+# create and place staged build check box
+check_stage = tk.Checkbutton(frame_parent_folder, text='Build locally, then publish in one step', variable=CV_stage)
+check_stage.grid(row=2, column=1, padx=5, sticky='W', columnspan=3)
+add_tip(check_stage, tip_text_stage)
+
+# create and place structure profile selector
+label_profile = ttk.Label(frame_parent_folder, text='Structure profile:')
+label_profile.grid(row=3, column=1, padx=5, sticky='W')
+combo_profile = ttk.Combobox(frame_parent_folder, textvariable=profile_name, state='readonly',
+                             values=structure_profiles.list_profiles(), width=20)
+combo_profile.grid(row=3, column=2, padx=5, sticky='W')
+combo_profile.bind('<<ComboboxSelected>>', select_profile)
+add_tip(combo_profile, tip_text_profile)
 
 # horizontal line separator for looks only
 ttk.Separator(frame_kernal_name, orient='horizontal').place(relx=0.0, rely=0.0, relwidth=1.0)
@@ -313,19 +398,19 @@ label_tab_name.grid(row=3, column=0, padx=5, pady=5, sticky='NW', columnspan=100
 # create and place date label
 # label_space.grid(row=4, column=0, sticky='W')
 label_date = ttk.Label(frame_kernal_name, text='Experiment date:')
-label_date.grid(row=4, column=1, padx=10, pady=10, sticky='E')
+label_date.grid(row=4, column=1, padx=10, pady=6, sticky='E')
 
-# create, place, and update date selector
-cal = DateEntry(frame_kernal_name, date_pattern='y-mm-dd', width=12, borderwidth=2)
-cal.grid(row=4, column=2, padx=5, pady=5, sticky='W')
-cal.bind("<<DateEntrySelected>>", save_date)  # update date everytime a day is selected on calendar.
+# create, place, and update date selector. The calendar opens on click.
+date_entry = ttk.Entry(frame_kernal_name, textvariable=date_string, width=12, state='readonly', cursor='hand2')
+date_entry.grid(row=4, column=2, padx=5, pady=5, sticky='W')
+date_entry.bind("<Button-1>", open_calendar)
 # add tool tip for button
-Balloon(cal, headertext=tip_text_header, text=tip_text_create_structure, background=None, image=None)
+add_tip(date_entry, tip_text_date_select)
 
 # create and place name label
 # label_space.grid(row=5, column=0, sticky='W')
 label_name = ttk.Label(frame_kernal_name, text='Experiment name:')
-label_name.grid(row=5, column=1, padx=10, pady=10, sticky='E')
+label_name.grid(row=5, column=1, padx=10, pady=6, sticky='E')
 
 # create and place name entry widget
 exp_name_entry = ttk.Entry(frame_kernal_name, textvariable=experiment_name, width=40)
@@ -333,15 +418,27 @@ exp_name_entry.grid(row=5, column=2, padx=5, pady=5, sticky='W')
 # update the name when Retrun is pressed
 exp_name_entry.bind("<KeyPress-Return>", save_exp_name)
 # add tool tip for button
-Balloon(exp_name_entry, headertext=tip_text_header, text=tip_text_name_enter, background=None, image=None)
+add_tip(exp_name_entry, tip_text_name_enter)
 
 # create and place name label
 # label_space.grid(row=6, column=0, sticky='W')
 label_kernal1 = ttk.Label(frame_kernal_name, text='Kernal name:')
-label_kernal1.grid(row=6, column=1, padx=10, pady=10, sticky='E')
+label_kernal1.grid(row=6, column=1, padx=10, pady=6, sticky='E')
 # This label will update when the kernal name changes
 label_kernal2 = ttk.Label(frame_kernal_name, textvariable=kernal_name)
 label_kernal2.grid(row=6, column=2, padx=5, pady=5, sticky='W', columnspan=100)
+# This label warns when the kernal name is already used in the parent folder
+label_collision = ttk.Label(frame_kernal_name, textvariable=collision_text, foreground='red')
+label_collision.grid(row=7, column=2, padx=5, sticky='W', columnspan=100)
+
+# create and place experiment search. Matches come from the experiment index.
+label_search = ttk.Label(frame_kernal_name, text='Find experiment:')
+label_search.grid(row=8, column=1, padx=10, sticky='E')
+combo_search = ttk.Combobox(frame_kernal_name, textvariable=search_text, width=37)
+combo_search.grid(row=8, column=2, padx=5, sticky='W')
+combo_search.bind('<<ComboboxSelected>>', show_search_result)
+search_text.trace_add('write', search_experiments)
+add_tip(combo_search, tip_text_search)
 
 #
 #
@@ -349,175 +446,131 @@ label_kernal2.grid(row=6, column=2, padx=5, pady=5, sticky='W', columnspan=100)
 # Folders Tab - user selects folders to create
 ########################################################################
 #
-# Divide tab into two columns using frames
-frame_folders_title = tk.Frame(tab_folders)
-frame_folders_title.place(relx=0, rely=0, relwidth=1.0, relheight=0.1)
-#
-frame_folders_main = tk.Frame(tab_folders)
-frame_folders_main.place(relx=0, rely=0.1, relwidth=0.5, relheight=1.0)
-#
-frame_folders_custom = tk.Frame(tab_folders)
-frame_folders_custom.place(relx=0.5, rely=0.1, relwidth=0.5, relheight=1.0)
+def build_folders_tab(frame, state):
+    ''' builds the Folders tab widgets for a profile. Called the first time they are shown. '''
+    # Divide tab into two columns using frames
+    frame_folders_title = tk.Frame(frame)
+    frame_folders_title.place(relx=0, rely=0, relwidth=1.0, relheight=0.1)
+    #
+    frame_folders_main = tk.Frame(frame)
+    frame_folders_main.place(relx=0, rely=0.1, relwidth=0.5, relheight=1.0)
+    #
+    frame_folders_custom = tk.Frame(frame)
+    frame_folders_custom.place(relx=0.5, rely=0.1, relwidth=0.5, relheight=1.0)
+
+    # create and place tab description
+    text_label_tab_folder = 'Select folders you want created automaticaly.'
+    label_tab_folder = ttk.Label(frame_folders_title, text=text_label_tab_folder, width=400)
+    label_tab_folder.grid(row=0, column=0, padx=5, pady=5, sticky='NW', columnspan=100)
+
+    # create and place section description
+    text_label_tab_folder_main = 'Main Folders'
+    label_tab_folder_main = ttk.Label(frame_folders_main, text=text_label_tab_folder_main, width=40)
+    label_tab_folder_main.grid(row=0, column=0, padx=5, pady=5, sticky='NW', columnspan=3)
+
+    # create and place section description
+    text_label_tab_folder_custom = 'Custom Folders'
+    label_tab_folder_custom = ttk.Label(frame_folders_custom, text=text_label_tab_folder_custom, width=40)
+    label_tab_folder_custom.grid(row=0, column=0, padx=5, pady=5, sticky='NW', columnspan=3)
+
+    # create and place the check boxes for profile folders. Sub folders are
+    # indented one column per level and start on their parent's row.
+    row = 1
+    depth_before = 0
+    for option in state['profile'].folders:
+        depth = option.key.count('/')
+        if depth > depth_before:
+            row -= 1
+        check = tk.Checkbutton(frame_folders_main, text=option.label, variable=state['folders'][option.key])
+        check.grid(row=row, column=depth, sticky='W')
+        row += 1
+        depth_before = depth
+
+    # vertical line separator for looks only
+    ttk.Separator(frame_folders_custom, orient='vertical').place(relx=0.0, rely=0.0, relheight=1.0)
+
+    # create and place the check boxes and entry fields for custom folders
+    for row, (var, name) in enumerate(state['custom'], 1):
+        check = tk.Checkbutton(frame_folders_custom, variable=var)
+        check.grid(row=row, column=0, sticky='E')
+        entry = ttk.Entry(frame_folders_custom, textvariable=name, width=20)
+        entry.grid(row=row, column=1, sticky='W')
 
-# create and place tab description
-text_label_tab_folder = 'Select folders you want created automaticaly.'
-label_tab_folder = ttk.Label(frame_folders_title, text=text_label_tab_folder, width=400)
-label_tab_folder.grid(row=0, column=0, padx=5, pady=5, sticky='NW', columnspan=100)
-
-# create and place section description
-text_label_tab_folder_main = 'Main Folders'
-label_tab_folder_main = ttk.Label(frame_folders_main, text=text_label_tab_folder_main, width=40)
-label_tab_folder_main.grid(row=0, column=0, padx=5, pady=5, sticky='NW', columnspan=3)
-
-# create and place section description
-text_label_tab_folder_custom = 'Custom Folders'
-label_tab_folder_custom = ttk.Label(frame_folders_custom, text=text_label_tab_folder_custom, width=40)
-label_tab_folder_custom.grid(row=0, column=0, padx=5, pady=5, sticky='NW', columnspan=3)
-
-#  create checkboxes
-CF01 = tk.Checkbutton(frame_folders_main, text = "data", variable=CV_data)
-CF02 = tk.Checkbutton(frame_folders_main, text = "images", variable=CV_images)
-CF03 = tk.Checkbutton(frame_folders_main, text = "JPG", variable=CV_JPG)
-CF04 = tk.Checkbutton(frame_folders_main, text = "NEF", variable=CV_NEF)
-CF05 = tk.Checkbutton(frame_folders_main, text = "PNG", variable=CV_PNG)
-CF06 = tk.Checkbutton(frame_folders_main, text = "SVG", variable=CV_SVG)
-CF07 = tk.Checkbutton(frame_folders_main, text = "notebooks", variable=CV_notebooks)
-CF08 = tk.Checkbutton(frame_folders_main, text = "plots", variable=CV_plots)
-CF09 = tk.Checkbutton(frame_folders_main, text = "videos", variable=CV_videos)
-
-entry_CV_custom0 = ttk.Entry(frame_folders_custom, textvariable=name_folder_custom_0, width=20)
-CF10 = tk.Checkbutton(frame_folders_custom, variable=CV_custom0)
-
-entry_CV_custom1 = ttk.Entry(frame_folders_custom, textvariable=name_folder_custom_1, width=20)
-CF11 = tk.Checkbutton(frame_folders_custom, variable=CV_custom1)
-
-entry_CV_custom2 = ttk.Entry(frame_folders_custom, textvariable=name_folder_custom_2, width=20)
-CF12 = tk.Checkbutton(frame_folders_custom, variable=CV_custom2)
-
-#  set default selection values
-CF01.select()
-CF02.select()
-CF03.select()
-CF04.select()
-CF05.select()
-CF06.select()
-CF07.select()
-CF08.select()
-CF09.select()
-CF10.deselect()
-CF11.deselect()
-CF12.deselect()
-
-# place the check boxes for main folders
-CF01.grid(row=1, column=0, sticky='W')
-CF02.grid(row=2, column=0, sticky='W')
-CF03.grid(row=2, column=1, sticky='W')
-CF04.grid(row=3, column=1, sticky='W')
-CF05.grid(row=4, column=1, sticky='W')
-CF06.grid(row=5, column=1, sticky='W')
-CF07.grid(row=6, column=0, sticky='W')
-CF08.grid(row=7, column=0, sticky='W')
-CF09.grid(row=8, column=0, sticky='W')
-
-# vertical line separator for looks only
-ttk.Separator(frame_folders_custom, orient='vertical').place(relx=0.0, rely=0.0, relheight=1.0)
-
-# place the check boxes and entry fields for custom folders
-CF10.grid(row=1, column=0, sticky='E')
-entry_CV_custom0.grid(row=1, column=1, sticky='W')
-
-CF11.grid(row=2, column=0, sticky='E')
-entry_CV_custom1.grid(row=2, column=1, sticky='W')
-
-CF12.grid(row=3, column=0, sticky='E')
-entry_CV_custom2.grid(row=3, column=1, sticky='W')
 #
 ########################################################################
 # Files Tab - user selects additional files to add to structure
 ########################################################################
 #
-# Divide tab into thre columns using frames
-frame_files_title = tk.Frame(tab_files)
-frame_files_title.place(relx=0, rely=0, relwidth=1.0, relheight=0.13)
-#
-frame_files_column_0 = tk.Frame(tab_files)
-frame_files_column_0.place(relx=0, rely=0.13, relwidth=0.333, relheight=1)
-#
-frame_files_column_1 = tk.Frame(tab_files)
-frame_files_column_1.place(relx=0.333, rely=0.13, relwidth=0.333, relheight=1)
-#
-frame_files_column_2 = tk.Frame(tab_files)
-frame_files_column_2.place(relx=0.666, rely=0.13, relwidth=0.333, relheight=1)
-#
-# create and place tab description
-label_tab_files_text = 'Select files you want created automaticaly.'
-label_tab_files = tk.Label(frame_files_title, text=label_tab_files_text)
- 
-# create and place column label
-label_tab_files_column_0_text = '*.txt note files'
-label_tab_files_column_0 = tk.Label(frame_files_column_0, text=label_tab_files_column_0_text)
-  
-# create and place column label
-label_tab_files_column_1_text = 'Data management files'
-label_tab_files_column_1 = tk.Label(frame_files_column_1, text=label_tab_files_column_1_text)
-
-# create and place column label
-label_tab_files_column_2_text = 'Drawing files'
-label_tab_files_column_2 = tk.Label(frame_files_column_2, text=label_tab_files_column_2_text)
-
-# create checkboxes
-C10 = tk.Checkbutton(frame_files_column_0, text = "_notes.txt", variable=CV_file_note)
-C11 = tk.Checkbutton(frame_files_column_0, text = "video_scripts.txt", variable=CV_file_video)
-C12 = tk.Checkbutton(frame_files_column_1, text = "_nb.ipynb Start", variable=CV_file_notebook)
-C13 = tk.Checkbutton(frame_files_column_1, text = "_py.py start", variable=CV_file_python)
-C14 = tk.Checkbutton(frame_files_column_1, text = "CA_template.xlsx", variable=CV_file_contact_angle)
-C15 = tk.Checkbutton(frame_files_column_1, text = "PT_tempplate.xlsx", variable=CV_file_pressure_transducer)
-C16 = tk.Checkbutton(frame_files_column_2, text = "_Exp_Setup.svg", variable=CV_file_exp_setup)
-C17 = tk.Checkbutton(frame_files_column_2, text = "concatenate.bat", variable=CV_file_concat_video)
-
-# set default conditions of checkbuttons
-C10.select()
-C11.select()
-C12.select()
-C13.deselect()
-C14.deselect()
-C15.deselect()
-C16.select()
-C17.select()
-
-# place labels
-label_tab_files.grid(row=0, column=0, padx=5, pady=5, sticky='NW') 
-label_tab_files_column_0.grid(row=0, column=0, padx=5, pady=5)  
-label_tab_files_column_1.grid(row=0, column=0, padx=5, pady=5)  
-label_tab_files_column_2.grid(row=0, column=0, padx=5, pady=5) 
-# place checkboxes
-C10.grid(row=1, column=0, sticky='W')
-C11.grid(row=2, column=0, sticky='W')
-C12.grid(row=1, column=0, sticky='W')
-C13.grid(row=2, column=0, sticky='W')
-C14.grid(row=3, column=0, sticky='W')
-C15.grid(row=4, column=0, sticky='W')
-C16.grid(row=1, column=0, sticky='W')
-C17.grid(row=2, column=0, sticky='W')
+def build_files_tab(frame, state):
+    ''' builds the Files tab widgets for a profile. Called the first time they are shown. '''
+    profile = state['profile']
+    columns = profile.file_columns or ('',) * (1 + max((option.column for option in profile.files), default=0))
+    width = 1 / len(columns)
+
+    # Divide tab into one column per profile file column using frames
+    frame_files_title = tk.Frame(frame)
+    frame_files_title.place(relx=0, rely=0, relwidth=1.0, relheight=0.13)
+
+    # create and place tab description
+    label_tab_files_text = 'Select files you want created automaticaly.'
+    label_tab_files = tk.Label(frame_files_title, text=label_tab_files_text)
+    label_tab_files.grid(row=0, column=0, padx=5, pady=5, sticky='NW')
+
+    # create and place column labels
+    frames_files_column = []
+    for index, text in enumerate(columns):
+        frame_files_column = tk.Frame(frame)
+        frame_files_column.place(relx=index * width, rely=0.13, relwidth=width, relheight=1)
+        tk.Label(frame_files_column, text=text).grid(row=0, column=0, padx=5, pady=5)
+        frames_files_column.append(frame_files_column)
+
+    # create and place checkboxes
+    rows = [1] * len(columns)
+    for option in profile.files:
+        column = min(option.column, len(columns) - 1)
+        check = tk.Checkbutton(frames_files_column[column], text=option.label, variable=state['files'][option.key])
+        check.grid(row=rows[column], column=0, sticky='W')
+        rows[column] += 1
+
 #
 ########################################################################
-# Buttons - provide user with two buttons: 1. create folders and 2. exit GUI
+# Buttons - provide user with three buttons: 1. create folders, 2. cancel and 3. exit GUI
 ########################################################################
 #
 # Create and place create button.
 button_create_folders = ttk.Button(frame2, text='Create Structure', command=create_folders)
 button_create_folders.grid(row=100, column=0, sticky='W')
 # add tool tip for button
-Balloon(button_create_folders, headertext=tip_text_header, text=tip_text_create_structure, background=None, image=None)
+add_tip(button_create_folders, tip_text_create_structure)
+
+# Create and place a cancel button.
+button_cancel = ttk.Button(frame2, text='Cancel', command=cancel_build)
+button_cancel.grid(row=100, column=1, padx=5, sticky='W')
+# add tool tip for button
+add_tip(button_cancel, tip_text_cancel)
 
 # Create and place a quit button.
 button_quit = ttk.Button(frame2, text='Exit', command=root.destroy)
 button_quit.grid(row=101, column=0, sticky='W')
 # add tool tip for button
-Balloon(button_quit, headertext=tip_text_header, text=tip_text_exit, background=None, image=None)
+add_tip(button_quit, tip_text_exit)
+
+# Create and place build progress. The worker thread reports through poll_worker.
+progress_bar = ttk.Progressbar(frame2, orient='horizontal', mode='determinate', length=220)
+progress_bar.grid(row=100, column=2, padx=5, sticky='W')
+label_status = ttk.Label(frame2, textvariable=status_text, width=40)
+label_status.grid(row=101, column=1, padx=5, sticky='W', columnspan=2)
 
 ########################################################################
 # Run GUI loop
 ########################################################################
 #
+tab_builders = {tab_folders: build_folders_tab, tab_files: build_files_tab}
+built_tabs = set()
+select_profile()
+worker = scaffold.BuildWorker()
+refresh_index()
+root.after(POLL_MS, poll_worker)
+if os.environ.get('EXPERIMENT_START_BENCHMARK'):
+    root.after(0, report_startup)
 root.mainloop()
\ No newline at end of file
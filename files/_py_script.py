@@ -19,8 +19,25 @@ from scipy.optimize import curve_fit
 from scipy.signal import savgol_filter
 from tkinter.filedialog import askopenfilename, askdirectory, askopenfilenames
 
+from exptools import hydraulics
+from exptools.accumulator import Accumulator, load_accumulators, plot_max_flow_rate, plot_spring_pressure, solve_accumulators
+from exptools.cache import TdmsCache
+from exptools.decimate import MinMaxDecimator, decimate, decimate_tdms
+from exptools.family import plot_family
+from exptools.filters import SavgolStream, savgol_chunks
+from exptools.fitting import fit_fluids, print_fits
+from exptools.fluids import EMIBF4, load_fluid, mu_temp_fit, rho_temp_fit, sigma_temp_fit
+from exptools.plots import PlotJob, export_plots, print_exports
+from exptools.sweep import sweep_R_h
+from exptools.tables import read_csv, VISCOSITY_SCHEMA, DENSITY_SCHEMA, SURFACE_TENSION_SCHEMA
+from exptools.tdms import iter_chunks, iter_files, load_files, print_throughput
+from exptools.transducer import Calibration, TransducerConverter
+from exptools.units import Linear, chain, psi_to_Pa, Pa_to_psi, K_to_C, C_to_K, mmmps_to_mlps, mmm_to_ml, ml_to_mmm
+
 # Define constants
 GOLDEN_RATIO = (1 + 5 ** 0.5) / 2
+# fluid whose properties are fitted to ../data/MaterialProperties_<fluid_name>_*.csv, see Temperature Limits
+fluid_name = 'EMIBF4'
 
 # user defined functions
 def get_data_file():
@@ -61,13 +78,10 @@ def get_tdms_files():
 def initialize_pressure_transducer(Ilow = 4E-3, Ihigh = 20E-3, Plow = -14.7, Phigh = 45):
     """Initialize the pressure transducer and return values to convert raw data to pressure in psi"""
     """Default values: Ilow = 4E-3, Ihigh = 20E-3, Plow = -14.7, Phigh = 15, R1 = 487.2, R2 = 488.6"""
-    # Place ranges into array for easy manipulation for linear model
-    Iarray = np.asarray([Ilow, Ihigh])
-    Parray = np.asarray([Plow, Phigh])
-    # Assume linear fit between the range and calculate the slope and intercept
-    LinearModel = stats.linregress(Iarray, Parray)
-    slope = LinearModel[0]
-    intercept = LinearModel[1]
+    # Assume linear between the range, see exptools.transducer for converting many channels in place
+    calibration = Calibration(Ilow, Ihigh, Plow, Phigh)
+    slope = calibration.slope
+    intercept = calibration.intercept
     print('Pressure transducer initialized:\n        I_lo:\t{0:0.3f} Amps\n        I_hi:\t{1:0.3f} Amps\n        P_lo:\t{2:0.1f} psi\n        P_hi:\t{3:0.1f} psi\n          '.format(Ilow, Ihigh, Plow, Phigh))
     return slope, intercept
 
@@ -87,91 +101,29 @@ def set_plot_folder():
     gc.collect()
     return(path)
 
-def psi_to_Pa(pressure):
-    """
-    Function returns a presure given in psi to Pa. 
-    """
-    return pressure * 6894.76
-
-def Pa_to_psi(pressure):
-    """
-    Function returns a presure given in psi to Pa. 
-    """
-    return pressure / 6894.76
-
-def K_to_C(temp):
-    """Returns a temperature in degrees Celcius given in Kelvin"""
-    return temp-272.15
-
-def C_to_K(temp):
-    """Returns a temperature in Kelvin given in degrees Celcius"""
-    return temp + 272.15
-
-def mmmps_to_mlps(flowrate):
-    """Returns a flowrate in ml/s given in m^3/s"""
-    return flowrate * 1e6
-
-def mmm_to_ml(volume):
-    """Returns a volume in mL given in m^3"""
-    return volume * 1e6
-
-def ml_to_mmm(volume):
-    """Returns a volume in m^3 given in mL"""
-    return volume * 1e-6
-
-def mu_temp_fit(x, a, b, c):
-    '''The form of the function that fits viscosity vs temperature data.'''
-    return(a * x**b + c)
-    
-def rho_temp_fit(x, a, b):
-    '''The form of the function that fits density vs temperature data.'''
-    return(a * x  + b)
-
-def sigma_temp_fit(x, a, b):
-    '''The form of the function that fits surface tension vs temperature data.'''
-    return(a * x  + b)   
-    
 def viscosity_temp(temp):
     '''Returns the viscosity (kg/m/s) given a temp (K).'''
-    mu_popt_F = np.array([ 5.58586277e+32, -1.38434792e+01,  6.56440863e-03]) 
-    mu = mu_temp_fit(temp, *mu_popt_F)
-    return mu
+    return fluid.viscosity(temp)
 
 def density_temp(temp):
     '''Returns the density (kg/m^3) given a temp (K).'''
-    rho_popt_F = np.array([-7.92013082e-01,  1.51830091e+03])
-    rho = rho_temp_fit(temp, * rho_popt_F)
-    return rho
+    return fluid.density(temp)
 
 def surface_tension_temp(temp):
     '''Returns the surface tension (kg/s^2) given a temp (K).'''
-    sigma_popt_F = np.array([-6.49547701e-05,  7.34300172e-02])
-    sigma = sigma_temp_fit(temp, *sigma_popt_F)
-    return sigma
+    return fluid.surface_tension(temp)
 
 def sum_R_h_lines(temp, L_lines, R_lines):
-    '''sums the hydraulic resistance of n lines at temp T in K'''
-    R_h_lines = []
-    mu = viscosity_temp(temp)
-    for line in range(len(L_lines)):
-        R_h_lines.append( 8 * mu * L_lines[line] / np.pi / R_lines[line]**4)
-    return np.array(R_h_lines).sum()
+    '''sums the hydraulic resistance of n lines at temp T in K. Broadcasts, see exptools.hydraulics'''
+    return hydraulics.R_h_lines(viscosity_temp(temp), L_lines, R_lines)
 
 def R_h_model(temp, N_valve, L_lines, R_lines):
-    '''sums and returns the hydraulic resistance of lines and N LFN valves'''
-    beta = 6.83e-13    # Units: ?
-    mu = viscosity_temp(temp)
-    R_h_LFN = N_valve * beta * mu
-    R_h_lines = sum_R_h_lines(temp, L_lines, R_lines)
-    R_h_total = R_h_LFN + R_h_lines
-    return R_h_total
+    '''sums and returns the hydraulic resistance of lines and N LFN valves. Broadcasts, see exptools.hydraulics'''
+    return hydraulics.R_h_model(viscosity_temp(temp), N_valve, L_lines, R_lines)
 
 def sum_volume_lines(L_lines, R_lines):
     '''sums the volume of n lines'''
-    volume_lines = []
-    for line in range(len(L_lines)):
-        volume_lines.append(L_lines[line] * np.pi * R_lines[line]**2)
-    return np.array(volume_lines).sum()
+    return hydraulics.volume_lines(L_lines, R_lines)
 
 
 # # Plot folder
@@ -198,6 +150,15 @@ temp_survive_low = C_to_K(-40)
 temp_survive_high = C_to_K(100)
 temp_room = 294.817
 
+# fit the fluid properties to their CSV files, fits are kept in ../data/property_fits.json until the data changes,
+# and tabulate them over the survivable range for fast lookups
+try:
+    print_fits(fit_fluids([fluid_name]))
+    fluid = load_fluid(fluid_name, table=(temp_survive_low, temp_survive_high))
+except FileNotFoundError as error:
+    print(f'{error.filename} not found, using the built-in EMIBF4 coefficients')
+    fluid = EMIBF4.tabulate(temp_survive_low, temp_survive_high)
+
 
 # # Fluid Properties
 # Critical fluid properties and their dependance on temperature are detailed below. Changes in viscosity impact flow rates the most. The density and surface tension are needed to check Reynolds numbers and Webber numbers.
@@ -207,8 +168,8 @@ temp_room = 294.817
 # In[4]:
 
 
-mu_data_file = Path(r'../data/MaterialProperties_EMIBF4_Viscosity.csv')
-mu_df = pd.read_csv(mu_data_file, sep=',').dropna()
+mu_data_file = Path(rf'../data/MaterialProperties_{fluid_name}_Viscosity.csv')
+mu_df = read_csv(mu_data_file, VISCOSITY_SCHEMA)
 
 temp_fit = np.arange(temp_survive_low, temp_survive_high, 1)
 
@@ -252,8 +213,8 @@ plot_path = plot_folder.joinpath(''.join(["Plot_", experiment_id, ".", plot_form
 # In[5]:
 
 
-rho_data_file = Path(r'../data/MaterialProperties_EMIBF4_Density.csv')
-rho_df = pd.read_csv(rho_data_file, sep=',').dropna()
+rho_data_file = Path(rf'../data/MaterialProperties_{fluid_name}_Density.csv')
+rho_df = read_csv(rho_data_file, DENSITY_SCHEMA)
 
 rho_high = density_temp(temp_op_high)
 rho_low = density_temp(temp_op_low)
@@ -295,8 +256,8 @@ plt.show()
 # In[6]:
 
 
-sigma_data_file = Path(r'../data/MaterialProperties_EMIBF4_SurfaceTension.csv')
-sigma_df = pd.read_csv(sigma_data_file, sep=',').dropna()
+sigma_data_file = Path(rf'../data/MaterialProperties_{fluid_name}_SurfaceTension.csv')
+sigma_df = read_csv(sigma_data_file, SURFACE_TENSION_SCHEMA)
 
 sigma_high = surface_tension_temp(temp_op_high)
 sigma_low = surface_tension_temp(temp_op_low)
@@ -336,80 +297,51 @@ plt.show()
 # # The Accumulator Model
 # 
 
+# In[ ]:
+
+
+# accumulator configurations of the hardware being compared, one row per accumulator in SI units.
+# the columns of ../data/accumulators.csv are described in exptools.accumulator, without it this section is skipped
+accumulator_file = Path(r'../data/accumulators.csv')
+configs = load_accumulators(accumulator_file) if accumulator_file.exists() else []
+if not configs:
+    print(f'No accumulator configurations in {accumulator_file}, skipping the accumulator model')
+
+# spring pressure, max flow rate and fill point of every configuration over the operating temperatures
+num = 200
+temp = np.linspace(temp_op_low, temp_op_high, 35)
+accumulators = solve_accumulators(configs, temp, num, viscosity=viscosity_temp) if configs else {}
+A_bore = configs[0].A_bore if configs else None
+
+
 # ## Spring Pressure and Maximum Flow Rates
 
 # In[100]:
 
 
-# make the plot
-fig, ax1 = plt.subplots(1, figsize = [7, 2*GOLDEN_RATIO] , dpi=100)
-
-# plot valve open time as a function of piston position over temperature range.
-plt.plot(x_DTB*1000, Pa_to_psi(P_spring_DTB), 'k', label='DTB')
-plt.plot(x_UTB*1000, Pa_to_psi(P_spring_UTB), 'k--', label='UTB')
-plt.plot(fill_length_DTB*1e3, Pa_to_psi(P_fill_DTB), 'ro', label=f'Pmax DTB = {Pa_to_psi(P_fill_DTB):0.3f} psi')
-plt.plot(fill_length_UTB*1e3, Pa_to_psi(P_fill_UTB), 'bo', label=f'Pmax UTB = {Pa_to_psi(P_fill_UTB):0.3f} psi')
-plt.plot(fill_length_DTBPMD*1e3, Pa_to_psi(P_fill_DTBPMD), 'r*', label=f'Pmax DTBPMD = {Pa_to_psi(P_fill_DTBPMD):0.3f} psi')
-plt.plot(fill_length_UTBPMD*1e3, Pa_to_psi(P_fill_UTBPMD), 'b*', label=f'Pmax UTBPMD = {Pa_to_psi(P_fill_UTBPMD):0.3f} psi')
-# plt.axvline(fill_length_DTB*1000, color='red', label=f'DTB max pressure {Pa_to_psi(P_fill_DTB):0.3f} psi')
-# plt.axvline(fill_length_UTB*1000, color='red', linestyle='--', label=f'UTB max pressure {Pa_to_psi(P_fill_UTB):0.3f} psi')
-# plt.fill_between([0, fill_length*1000], [15, 15], \
-#                  alpha=0.1, label=r'Filled Volume $\forall=${0:0.3f} mL'.format(mmm_to_ml(fill_volume)), \
-#                  color='black', hatch='', linewidth=0.0, zorder=1)  
-plt.legend()
-plt.xlabel(r'Piston Position, $x$ [mm]')    
-plt.ylabel(r'Pressure, $P_b$ [psi]')
-# plt.title(f'Dose = {mmm_to_ml(dose):0.3f} ml, k = {keff:0.0f}, effenciency = {mech_eff:0.2f}')
-ax1.set_xlim(0, max(x_DTB.max()*1000, x_UTB.max()*1000))
-ax1.set_ylim(0, 30)
-
-# add volume scale to the bottom of the plot
-ax3 = ax1.twiny()
-ax3.xaxis.set_ticks_position('bottom')
-ax3.xaxis.set_label_position('bottom')
-ax3.spines['bottom'].set_position(('outward', 40))
-ax3.set_xlabel(r'Volume, $\forall_b$ [mL]')
-ax3.set_xlim(0, mmm_to_ml(max(x_DTB.max(), x_UTB.max()) * A_bore))
-ax3.set_ylim(0, )
-ax3.plot(mmm_to_ml(x_DTB * A_bore), np.ones(num)-2, lw=0)
-
-# save and show the plot
-experiment_id = f'Pressure_v_pistionPos_compare'
-plot_path = plot_folder.joinpath(''.join(["Plot_", experiment_id, ".", plot_format]))
-plt.savefig(plot_path, dpi=600, bbox_inches='tight', transparent=True)
-plt.show()
+# plot spring pressure against piston position, the plot code is exptools.accumulator.plot_spring_pressure
+if accumulators:
+    fig = plot_spring_pressure(accumulators, A_bore)
+    plt.show()
 
 
 # In[81]:
 
 
-# ranges for color map generation
-ES = np.linspace(0, 1, len(temp))
-AW = np.arange(0, len(temp))
-# normalize color map across temperature range
-normal = plt.Normalize(K_to_C(temp.min()), K_to_C(temp.max()))
-
-# make the plot
-fig, ax1 = plt.subplots(1, figsize = [7, 2*GOLDEN_RATIO] , dpi=100)
-
-# plot valve open time as a function of piston position over temperature range.
-for i,j in zip(AW, ES):
-    ax1.plot(x_DTB * 1000, mmm_to_ml(Q_DTB[i]), c=cm.viridis((j)), zorder=-10)
-plt.fill_between([0, fill_length_DTB*1000], [.4, .4],                  alpha=0.1, label=r'Filled Volume $\forall=${0:0.3f} mL'.format(mmm_to_ml(fill_volume_DTB)),                  color='black', hatch='', linewidth=0.0, zorder=1)    
-plt.title('DTB')
-plt.xlabel(r'Piston Position, $x$ [mm]')    
-plt.ylabel(r'Max Flow Rate, $Q_{max}$ [ml/s]')
-# plt.title(f'Dose = {mmm_to_ml(dose):0.3f} ml, k = {keff:0.0f}, effenciency = {mech_eff:0.2f}')
-ax1.set_xlim(0, x_DTB.max()*1000)
-ax1.set_ylim(0, .4)
-
-# make the color bar
-cax, _ = cbar.make_axes(ax1) 
-cb2 = cbar.ColorbarBase(cax, cmap=cm.viridis, norm=normal, label='Temperature, $T$ [$^\circ$C]')
-
-# save and show the plot
-experiment_id = f'MaxFlowRate_v_Temp_DTB'
-plot_path = plot_folder.joinpath(''.join(["Plot_", experiment_id, ".", plot_format]))
-plt.savefig(plot_path, dpi=600, bbox_inches='tight', transparent=True)
-plt.show()
+# plot max flow rate against piston position over the temperature range, see exptools.accumulator
+for name, result in accumulators.items():
+    fig = plot_max_flow_rate(result, temp, title=name)
+    plt.show()
+
+
+# In[ ]:
+
+
+# save the plots to the plot folder on a process pool, a plot is only drawn again when its code or data changed
+plot_jobs = []
+if accumulators:
+    plot_jobs.append(PlotJob('Pressure_v_pistionPos_compare', plot_spring_pressure, (accumulators, A_bore)))
+plot_jobs += [PlotJob(f'MaxFlowRate_v_Temp_{name}', plot_max_flow_rate, (result, temp), {'title': name})
+              for name, result in accumulators.items()]
+print_exports(export_plots(plot_jobs, plot_folder, plot_format))
 
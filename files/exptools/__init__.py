@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Analysis helpers shared by the experiment notebooks.
+
+This package is copied into every experiment's notebooks/ folder next to the
+starting notebook, so it can be imported with "import exptools" or
+"from exptools.tdms import iter_chunks".
+'''
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Spring loaded accumulator model over temperature and piston position.
+
+The spring pushes the piston with preload + keff * x, so the pressure in the
+bore is P_spring = mech_eff * (preload + keff * x) / A_bore. The largest flow
+the accumulator can drive through its lines and valves at a temperature is
+Q = P_spring / R_h, with R_h from exptools.hydraulics. The fill point is the
+piston position of the filled volume, fill_length = fill_volume / A_bore.
+
+The configurations of the hardware being compared are read from a CSV,
+one row per accumulator with a column per Accumulator field in SI units
+and the lines of L_lines and R_lines separated by ';'. Every cell has to
+be filled in, there are no default values:
+
+    name,A_bore,keff,preload,mech_eff,stroke,fill_volume,N_valve,L_lines,R_lines
+    DTB,<m^2>,<N/m>,<N>,<0-1>,<m>,<m^3>,<count>,<m>;<m>,<m>;<m>
+
+solve_accumulators() stacks any number of configurations and computes every
+one of them over the whole temperature x position grid in one broadcast pass:
+
+    configs = load_accumulators('../data/accumulators.csv')
+    results = solve_accumulators(configs, temp, num=200, viscosity=viscosity_temp)
+    x_DTB, P_spring_DTB, Q_DTB, fill_length_DTB, fill_volume_DTB, P_fill_DTB, Q_fill_DTB = results['DTB']
+
+Q has the shape (temperatures, positions), so Q_DTB[i] is the flow rate
+against position at temp[i].
+
+plot_spring_pressure() and plot_max_flow_rate() draw the notebook's
+accumulator figures from the results and return the figure, so they can be
+shown in the notebook and saved in parallel with exptools.plots:
+
+    export_plots([PlotJob('MaxFlowRate_v_Temp_DTB', plot_max_flow_rate, (results['DTB'], temp), {'title': 'DTB'})],
+                 plot_folder)
+'''
+
+# import liberaries
+import csv
+
+from collections import namedtuple
+
+import numpy as np
+
+from .hydraulics import BETA_LFN, line_factor
+from .units import Linear, Pa_to_psi, chain, K_to_C, mmm_to_ml
+
+# define constants
+FIGSIZE = [7, 2 * (1 + 5 ** 0.5) / 2]  # the notebook's [7, 2*GOLDEN_RATIO]
+LINE_STYLES = ('k', 'k--', 'k-.', 'k:')
+POINT_STYLES = ('ro', 'bo', 'r*', 'b*', 'g^', 'm^', 'gs', 'ms')
+Accumulator = namedtuple('Accumulator', ['name', 'A_bore', 'keff', 'preload', 'mech_eff', 'stroke',
+                                         'fill_volume', 'N_valve', 'L_lines', 'R_lines'])
+Accumulator.__doc__ = '''
+One accumulator configuration, SI units: bore area (m^2), spring rate (N/m),
+spring preload (N), mechanical efficiency, stroke (m), filled volume (m^3),
+number of LFN valves, and the lengths and radii (m) of its lines.'''
+
+LIST_FIELDS = ('L_lines', 'R_lines')
+
+AccumulatorResult = namedtuple('AccumulatorResult', ['x', 'P_spring', 'Q', 'fill_length', 'fill_volume',
+                                                     'P_fill', 'Q_fill'])
+
+
+def load_accumulators(path='../data/accumulators.csv'):
+    '''
+    Reads the accumulator configurations from a CSV with one row per
+    accumulator, none for a table without rows. Raises FileNotFoundError or
+    ValueError, naming the file and what is missing, until every row is
+    filled in.
+    '''
+    columns = ','.join(Accumulator._fields)
+    try:
+        with open(path, newline='') as file:
+            reader = csv.DictReader(file)
+            rows = [(reader.line_num, row) for row in reader if any((value or '').strip() for value in row.values())]
+            fields = reader.fieldnames or []
+    except FileNotFoundError:
+        raise FileNotFoundError(f'No accumulator configurations, add {path} with the columns {columns}') from None
+
+    missing = [field for field in Accumulator._fields if field not in fields]
+    if fields and missing:
+        raise ValueError(f'{path} is missing the columns {", ".join(missing)}')
+
+    configs = []
+    for number, row in rows:
+        blank = [field for field in Accumulator._fields if not (row[field] or '').strip()]
+        if blank:
+            raise ValueError(f'{path} line {number}: fill in {", ".join(blank)}')
+        try:
+            values = {field: float(row[field]) for field in Accumulator._fields[1:] if field not in LIST_FIELDS}
+            values.update({field: [float(value) for value in row[field].split(';')] for field in LIST_FIELDS})
+        except ValueError as error:
+            raise ValueError(f'{path} line {number}: {error}') from None
+        if len(values['L_lines']) != len(values['R_lines']):
+            raise ValueError(f'{path} line {number}: L_lines and R_lines need one value per line')
+        configs.append(Accumulator(name=row['name'].strip(), **values))
+    return configs
+
+
+def _stack_lines(values, count, fill):
+    '''Pads the line lists of the configurations to the same length.'''
+    stacked = np.full((len(values), count), fill, dtype=float)
+    for row, lines in enumerate(values):
+        lines = np.atleast_1d(np.asarray(lines, dtype=float))
+        stacked[row, :len(lines)] = lines
+    return stacked
+
+
+def solve_accumulators(configs, temp, num=200, viscosity=None, beta=BETA_LFN):
+    '''
+    Computes spring pressure, maximum flow rate and fill point of every
+    configuration over temp (K) and num piston positions from 0 to the
+    stroke. viscosity is a function of temperature, by default EMIBF4.
+    Returns {name: AccumulatorResult}.
+    '''
+    if viscosity is None:
+        from .fluids import EMIBF4
+        viscosity = EMIBF4.viscosity
+
+    configs = list(configs)
+    temp = np.atleast_1d(np.asarray(temp, dtype=float))
+    columns = {field: np.array([getattr(config, field) for config in configs], dtype=float)[:, None]
+               for field in ('A_bore', 'keff', 'preload', 'mech_eff', 'stroke', 'fill_volume', 'N_valve')}
+
+    # (configs, positions)
+    x = columns['stroke'] * np.linspace(0, 1, num)[None, :]
+    force_to_pressure = columns['mech_eff'] / columns['A_bore']
+    P_spring = force_to_pressure * (columns['preload'] + columns['keff'] * x)
+
+    # (configs, temperatures), missing lines padded with zero length lines
+    count = max(len(np.atleast_1d(config.L_lines)) for config in configs)
+    L_lines = _stack_lines([config.L_lines for config in configs], count, 0.0)
+    R_lines = _stack_lines([config.R_lines for config in configs], count, 1.0)
+    R_h = viscosity(temp)[None, :] * (columns['N_valve'] * beta + line_factor(L_lines, R_lines)[:, None])
+
+    # (configs, temperatures, positions)
+    Q = P_spring[:, None, :] / R_h[:, :, None]
+
+    fill_length = columns['fill_volume'] / columns['A_bore']
+    P_fill = force_to_pressure * (columns['preload'] + columns['keff'] * fill_length)
+    Q_fill = P_fill / R_h
+
+    return {config.name: AccumulatorResult(x[row], P_spring[row], Q[row], fill_length[row, 0],
+                                           columns['fill_volume'][row, 0], P_fill[row, 0], Q_fill[row])
+            for row, config in enumerate(configs)}
+
+
+def plot_spring_pressure(results, A_bore, curves=None, points=None, ylim=30):
+    '''
+    Plots the spring pressure (psi) against piston position of the curves and
+    the fill point of the points (names in results, all by default), with a
+    volume scale for a bore of area A_bore under the plot. Returns the figure.
+    '''
+    import matplotlib.pyplot as plt
+
+    curves = list(results) if curves is None else list(curves)
+    points = list(results) if points is None else list(points)
+    fig, ax1 = plt.subplots(1, figsize=FIGSIZE, dpi=100)
+
+    # spring pressure over the stroke and the pressure at the filled volume
+    for index, name in enumerate(curves):
+        result = results[name]
+        ax1.plot(result.x * 1000, Pa_to_psi(result.P_spring), LINE_STYLES[index % len(LINE_STYLES)], label=name)
+    for index, name in enumerate(points):
+        result = results[name]
+        P_fill = Pa_to_psi(result.P_fill)
+        ax1.plot(result.fill_length * 1e3, P_fill, POINT_STYLES[index % len(POINT_STYLES)],
+                 label=f'Pmax {name} = {P_fill:0.3f} psi')
+    ax1.legend()
+    ax1.set_xlabel(r'Piston Position, $x$ [mm]')
+    ax1.set_ylabel(r'Pressure, $P_b$ [psi]')
+    x_max = max(results[name].x.max() for name in curves)
+    ax1.set_xlim(0, x_max * 1000)
+    ax1.set_ylim(0, ylim)
+
+    # add volume scale to the bottom of the plot
+    ax3 = ax1.twiny()
+    ax3.xaxis.set_ticks_position('bottom')
+    ax3.xaxis.set_label_position('bottom')
+    ax3.spines['bottom'].set_position(('outward', 40))
+    ax3.set_xlabel(r'Volume, $\forall_b$ [mL]')
+    ax3.set_xlim(0, mmm_to_ml(x_max * A_bore))
+    ax3.set_ylim(0, )
+    x = results[curves[0]].x
+    ax3.plot(chain(Linear(A_bore), mmm_to_ml)(x), np.ones(len(x)) - 2, lw=0)
+    return fig
+
+
+def plot_max_flow_rate(result, temp, title=None, cmap='viridis', ylim=0.4):
+    '''
+    Plots the maximum flow rate (ml/s) against piston position of one
+    AccumulatorResult at every temperature of temp (K), colored by
+    temperature, with the filled volume shaded. Returns the figure.
+    '''
+    import matplotlib.pyplot as plt
+
+    from .family import plot_family
+
+    temp_C = K_to_C(np.asarray(temp, dtype=float))
+    fig, ax1 = plt.subplots(1, figsize=FIGSIZE, dpi=100)
+
+    # all temperatures are one artist, with the color bar made from the same norm
+    plot_family(ax1, result.x * 1000, mmm_to_ml(result.Q), temp_C, cmap=cmap,
+                norm=plt.Normalize(temp_C.min(), temp_C.max()), label='Temperature, $T$ [$^\\circ$C]', zorder=-10)
+    ax1.fill_between([0, result.fill_length * 1000], [ylim, ylim], alpha=0.1,
+                     label=r'Filled Volume $\forall=${0:0.3f} mL'.format(mmm_to_ml(result.fill_volume)),
+                     color='black', hatch='', linewidth=0.0, zorder=1)
+    if title:
+        ax1.set_title(title)
+    ax1.set_xlabel(r'Piston Position, $x$ [mm]')
+    ax1.set_ylabel(r'Max Flow Rate, $Q_{max}$ [ml/s]')
+    ax1.set_xlim(0, result.x.max() * 1000)
+    ax1.set_ylim(0, ylim)
+    return fig
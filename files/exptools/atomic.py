@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Atomic file writes for the caches and plots saved next to the data.
+
+atomic_write() opens a uniquely named temporary file in the folder of the
+target and renames it onto the target once the block finishes without an
+error, so a reader never picks up a half written file. Every call gets its
+own temporary file, so threads of one kernel and separate processes writing
+the same target do not write over each other; the last one to finish wins.
+
+    with atomic_write(plot_folder.joinpath('.plot_hashes.json'), 'w') as file:
+        json.dump(hashes, file)
+'''
+
+# import liberaries
+import os
+import tempfile
+
+from contextlib import contextmanager
+from pathlib import Path
+
+# define constants
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    '''
+    Yields a file opened with mode in the folder of path, which replaces
+    path when the block exits cleanly and is deleted otherwise.
+    '''
+    path = Path(path)
+    file = tempfile.NamedTemporaryFile(mode, dir=path.parent, prefix=f'.{path.name}.', suffix='.partial',
+                                       delete=False)
+    try:
+        with file:
+            yield file
+        # the permissions open() would have given, temporary files are private to the user
+        os.chmod(file.name, 0o666 & ~UMASK)
+        os.replace(file.name, path)
+    except BaseException:
+        try:
+            os.unlink(file.name)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+On-disk columnar cache of parsed TDMS data.
+
+The first load of a TDMS file streams each channel into its own .npy file in
+the cache folder (data/tdms_cache by default). Later loads return read-only
+memory maps of those files, which takes milliseconds whatever the size of
+the data, and only the pages that are used are read from disk.
+
+Entries are keyed by a sha256 of the file contents. The digest of each raw
+file is remembered with its path, size and mtime, so a file is only hashed
+again when it changes. A changed file gets a new entry and the old entry is
+removed once no file uses it. When the cache grows past max_bytes the least
+recently used entries are deleted.
+
+    cache = TdmsCache()
+    data = cache.load(path, [('Data', 'Pressure')])
+    pressure = data['Data', 'Pressure']
+
+The bookkeeping is a small SQLite file in the cache folder, so several
+notebooks or worker processes can share one cache. It also keeps the
+channel names and lengths of each entry, so a cache hit does not open the raw
+file, which may be on a network share, to list its channels.
+'''
+
+# import liberaries
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+
+import numpy as np
+
+from .tdms import channel_lengths, iter_chunks
+
+# define constants
+DEFAULT_CACHE_FOLDER = Path('../data/tdms_cache')  # relative to the notebooks folder
+DEFAULT_MAX_BYTES = 20 * 2**30
+HASH_BLOCK_SIZE = 2**20
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT PRIMARY KEY,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    channels TEXT
+);
+CREATE TABLE IF NOT EXISTS channels (
+    digest TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    file TEXT NOT NULL,
+    PRIMARY KEY (digest, grp, name)
+);
+'''
+
+
+def file_digest(path):
+    '''Returns the sha256 hex digest of a file, read in blocks.'''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _dump_lengths(lengths):
+    return json.dumps([[group, name, length] for (group, name), length in lengths.items()])
+
+
+class TdmsCache:
+    '''Cache of TDMS channels as memory-mappable .npy files.'''
+
+    def __init__(self, folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.folder.joinpath('cache.sqlite')), timeout=60, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(entries)')]
+        if 'channels' not in columns:  # a cache made before the channel lists were kept
+            with self._db:
+                self._db.execute('ALTER TABLE entries ADD COLUMN channels TEXT')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def digest(self, path):
+        '''Returns the content digest of a raw file, hashing it only if it changed since last time.'''
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db.execute('SELECT size, mtime_ns, digest FROM sources WHERE path = ?', (path,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+
+        digest = file_digest(path)
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                                 (path, stat.st_size, stat.st_mtime_ns, digest))
+        if row is not None and row[2] != digest:
+            self._drop_unused(row[2])
+        return digest
+
+    def load(self, path, channels=None):
+        '''
+        Returns {(group, channel): read-only memory map} for a TDMS file,
+        converting the channels that are not cached yet.
+        '''
+        digest = self.digest(path)
+        wanted = list(self.channel_lengths(path, digest)) if channels is None else list(channels)
+        with self._lock:
+            cached = {(group, name): file for group, name, file in self._db.execute(
+                'SELECT grp, name, file FROM channels WHERE digest = ?', (digest,))}
+        missing = [key for key in wanted if key not in cached]
+        if missing:
+            cached.update(self._convert(path, digest, missing))
+
+        with self._lock:
+            with self._db:
+                self._db.execute('UPDATE entries SET last_used = ? WHERE digest = ?', (time.time(), digest))
+        if missing:
+            self.evict(keep=digest)
+
+        entry = self.folder.joinpath(digest)
+        return {key: np.load(entry.joinpath(cached[key]), mmap_mode='r') for key in wanted}
+
+    def channel_lengths(self, path, digest=None):
+        '''
+        Returns {(group, channel): number of values} of every channel of a
+        raw file, from the cache when the file has been converted before.
+        '''
+        digest = self.digest(path) if digest is None else digest
+        with self._lock:
+            row = self._db.execute('SELECT channels FROM entries WHERE digest = ?', (digest,)).fetchone()
+        if row is not None and row[0] is not None:
+            return {(group, name): length for group, name, length in json.loads(row[0])}
+
+        lengths = channel_lengths(path)
+        with self._lock:
+            with self._db:
+                self._db.execute('UPDATE entries SET channels = ? WHERE digest = ?', (_dump_lengths(lengths), digest))
+        return lengths
+
+    def _convert(self, path, digest, channels):
+        '''Streams channels into .npy files. Returns {(group, channel): file name}.'''
+        entry = self.folder.joinpath(digest)
+        entry.mkdir(exist_ok=True)
+        # every channel is listed while the file is open anyway, for loads of all channels later
+        lengths = channel_lengths(path)
+        if not set(channels) <= set(lengths):
+            channel_lengths(path, channels)  # raises KeyError naming the missing channel
+        suffix = f'.partial-{os.getpid()}-{threading.get_ident()}'
+        files = {key: hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16] + '.npy' for key in channels}
+        outputs = {}
+        try:
+            for chunk in iter_chunks(path, channels):
+                for key, values in chunk.data.items():
+                    if key not in outputs:
+                        partial = entry.joinpath(files[key] + suffix)
+                        outputs[key] = np.lib.format.open_memmap(partial, mode='w+', dtype=values.dtype,
+                                                                 shape=(lengths[key],))
+                    outputs[key][chunk.start:chunk.start + len(values)] = values
+            for key in channels:
+                partial = entry.joinpath(files[key] + suffix)
+                if key not in outputs:  # empty channel
+                    with open(partial, 'wb') as file:
+                        np.save(file, np.empty(0), allow_pickle=False)
+                else:
+                    outputs.pop(key).flush()
+                os.replace(partial, entry.joinpath(files[key]))
+        finally:
+            outputs.clear()
+            for partial in entry.glob('*' + suffix):
+                partial.unlink()
+
+        # the size on disk, so a retried or concurrent conversion of the same entry is not counted twice
+        nbytes = sum(file.stat().st_size for file in entry.glob('*.npy'))
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR IGNORE INTO entries VALUES (?, 0, ?, NULL)', (digest, time.time()))
+                self._db.execute('UPDATE entries SET nbytes = ?, channels = ? WHERE digest = ?',
+                                 (nbytes, _dump_lengths(lengths), digest))
+                self._db.executemany('INSERT OR REPLACE INTO channels VALUES (?, ?, ?, ?)',
+                                     [(digest, group, name, files[group, name]) for group, name in channels])
+        return files
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(nbytes), 0) FROM entries').fetchone()[0]
+
+    def evict(self, keep=None):
+        '''Deletes least recently used entries until the cache fits max_bytes. Returns the number deleted.'''
+        with self._lock:
+            rows = self._db.execute('SELECT digest, nbytes FROM entries ORDER BY last_used').fetchall()
+        total = sum(nbytes for _, nbytes in rows)
+        deleted = 0
+        for digest, nbytes in rows:
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            self._delete(digest)
+            total -= nbytes
+            deleted += 1
+        return deleted
+
+    def _drop_unused(self, digest):
+        with self._lock:
+            used = self._db.execute('SELECT 1 FROM sources WHERE digest = ?', (digest,)).fetchone()
+        if used is None:
+            self._delete(digest)
+
+    def _delete(self, digest):
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM entries WHERE digest = ?', (digest,))
+                self._db.execute('DELETE FROM channels WHERE digest = ?', (digest,))
+        # files still memory mapped can not be deleted on Windows, clear() removes them later
+        shutil.rmtree(self.folder.joinpath(digest), ignore_errors=True)
+
+    def clear(self):
+        '''Deletes every entry, and any entry folder left behind by an earlier delete.'''
+        with self._lock:
+            digests = {row[0] for row in self._db.execute('SELECT digest FROM entries')}
+        digests.update(path.name for path in self.folder.iterdir() if path.is_dir())
+        for digest in digests:
+            self._delete(digest)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Downsampling of long channels for plotting.
+
+A plot is only a couple of thousand pixels wide, so plotting tens of millions
+of points draws the same pixels over and over. MinMaxDecimator splits a
+series into a fixed number of buckets and keeps the minimum and maximum of
+each, in the order they occur, so every peak is still drawn. It is fed chunk
+by chunk, so the full resolution series never has to be in memory:
+
+    decimator = MinMaxDecimator(total=len_of_channel, buckets=2000)
+    for chunk in iter_files(get_tdms_files(), [('Data', 'Pressure')]):
+        decimator.update(chunk.data['Data', 'Pressure'])
+    index, pressure = decimator.result()
+
+decimate_tdms() does the same straight from the files. lttb() (largest
+triangle three buckets) keeps the visual shape with one point per bucket and
+is best used on a series that is already min/max reduced, see decimate().
+'''
+
+# import liberaries
+import numpy as np
+
+# define constants
+DEFAULT_BUCKETS = 2000  # about the width in pixels of a 6 inch figure at 300 dpi
+
+
+def pixel_buckets(ax):
+    '''Returns the width in pixels of a matplotlib axes, a good number of buckets for it.'''
+    return max(1, int(round(ax.get_window_extent().width)))
+
+
+class MinMaxDecimator:
+    '''Streaming min/max per bucket decimation of a series of known length.'''
+
+    def __init__(self, total, buckets=DEFAULT_BUCKETS):
+        self.width = max(1, -(-int(total) // max(1, buckets)))
+        self.count = 0
+        self._x = []
+        self._y = []
+        self._carry = None  # (start, y, x) of the bucket that is not full yet
+
+    def update(self, y, x=None):
+        '''Adds the next chunk of values, with their x values or None to use the sample index.'''
+        y = np.asarray(y)
+        x = None if x is None else np.asarray(x)
+        start = 0
+        if self._carry is not None:
+            carry_start, carry_y, carry_x = self._carry
+            need = self.width - len(carry_y)
+            carry_y = np.concatenate([carry_y, y[:need]])
+            if carry_x is not None:
+                carry_x = np.concatenate([carry_x, x[:need]])
+            if len(carry_y) < self.width:
+                self._carry = (carry_start, carry_y, carry_x)
+                self.count += len(y)
+                return
+            self._reduce(carry_y, carry_x, carry_start)
+            self._carry = None
+            start = need
+
+        full = (len(y) - start) // self.width * self.width
+        if full:
+            self._reduce(y[start:start + full], None if x is None else x[start:start + full], self.count + start)
+        rest = start + full
+        if rest < len(y):
+            # chunk buffers are reused by the reader, so the tail is copied
+            self._carry = (self.count + rest, y[rest:].copy(), None if x is None else x[rest:].copy())
+        self.count += len(y)
+
+    def _reduce(self, y, x, offset):
+        width = min(self.width, len(y))
+        blocks = y.reshape(-1, width)
+        low = blocks.argmin(axis=1)
+        high = blocks.argmax(axis=1)
+        base = np.arange(len(blocks)) * width
+        index = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=1) + base[:, None]
+        index = index.reshape(-1)
+        self._y.append(y[index])
+        self._x.append(offset + index if x is None else x[index])
+
+    def result(self):
+        '''Returns the decimated (x, y), two points per bucket.'''
+        if self._carry is not None:
+            carry_start, carry_y, carry_x = self._carry
+            self._reduce(carry_y, carry_x, carry_start)
+            self._carry = None
+        if not self._y:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(self._x), np.concatenate(self._y)
+
+
+def minmax(y, x=None, buckets=DEFAULT_BUCKETS):
+    '''Min/max decimation of an array in memory. Returns (x, y).'''
+    decimator = MinMaxDecimator(len(y), buckets)
+    decimator.update(y, x)
+    return decimator.result()
+
+
+def lttb(x, y, n_out):
+    '''Largest triangle three buckets downsampling to n_out points. Returns (x, y).'''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+    every = (n - 2) / (n_out - 2)
+    index = np.empty(n_out, dtype=np.intp)
+    index[0] = 0
+    index[-1] = n - 1
+    selected = 0
+    for bucket in range(n_out - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        mean_x = x[end:next_end].mean()
+        mean_y = y[end:next_end].mean()
+        area = np.abs((x[selected] - mean_x) * (y[start:end] - y[selected])
+                      - (x[selected] - x[start:end]) * (mean_y - y[selected]))
+        selected = start + int(area.argmax())
+        index[bucket + 1] = selected
+    return x[index], y[index]
+
+
+def decimate(y, x=None, buckets=DEFAULT_BUCKETS, method='minmax'):
+    '''
+    Reduces a series to about 2 * buckets points with method='minmax', or to
+    buckets points with method='lttb' (min/max to 4 * buckets first).
+    '''
+    if method == 'minmax':
+        return minmax(y, x, buckets)
+    if method == 'lttb':
+        return lttb(*minmax(y, x, 2 * buckets), buckets)
+    raise ValueError(f'Unknown decimation method {method!r}')
+
+
+def decimate_tdms(paths, channel, buckets=DEFAULT_BUCKETS, x_channel=None, method='minmax'):
+    '''
+    Streams one channel of a list of TDMS files, e.g. from get_tdms_files(),
+    through a MinMaxDecimator. x_channel is the (group, channel) of the x
+    values, by default the sample index is used. Returns (x, y).
+    '''
+    from .tdms import channel_lengths, iter_files
+
+    if method not in ('minmax', 'lttb'):
+        raise ValueError(f'Unknown decimation method {method!r}')
+    channels = [channel] if x_channel is None else [channel, x_channel]
+    total = sum(channel_lengths(path, [channel])[channel] for path in paths)
+    decimator = MinMaxDecimator(total, buckets if method == 'minmax' else 2 * buckets)
+    for chunk in iter_files(paths, channels):
+        decimator.update(chunk.data[channel], None if x_channel is None else chunk.data[x_channel])
+    x, y = decimator.result()
+    if method == 'lttb':
+        return lttb(x, y, buckets)
+    return x, y
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Savitzky-Golay filtering of channels that do not fit in memory.
+
+SavgolStream takes a channel chunk by chunk and returns the filtered values
+as soon as the window to the right of them has been seen, so the output lags
+the input by half a window. Each chunk is filtered with scipy's savgol_filter
+together with the last window of the previous input, and only the values
+with a full window on both sides, or at a true end of the channel, are kept.
+The result is the same as savgol_filter on the whole array, for any mode but
+'wrap', with memory set by the chunk size.
+
+Several derivatives come out of the same pass, e.g. smoothed pressure and
+its rate of change:
+
+    stream = SavgolStream(window_length=101, polyorder=3, deriv=(0, 1), delta=dt)
+    for chunk in iter_files(get_tdms_files(), [('Data', 'Pressure')]):
+        smoothed, rate = stream.update(chunk.data['Data', 'Pressure'])
+        ...
+    smoothed, rate = stream.finish()
+'''
+
+# import liberaries
+import numpy as np
+
+from scipy.signal import savgol_filter
+
+
+class SavgolStream:
+    '''Streaming savgol_filter. deriv may be one order or a tuple of orders.'''
+
+    def __init__(self, window_length, polyorder, deriv=0, delta=1.0, mode='interp', cval=0.0):
+        if mode == 'wrap':
+            raise ValueError("mode='wrap' needs both ends of the channel and can not be streamed")
+        if window_length % 2 == 0 or window_length <= polyorder:
+            raise ValueError('window_length must be odd and larger than polyorder')
+        self.window_length = window_length
+        self.polyorder = polyorder
+        self.derivs = (deriv,) if np.ndim(deriv) == 0 else tuple(deriv)
+        self.single = np.ndim(deriv) == 0
+        self.delta = delta
+        self.mode = mode
+        self.cval = cval
+        self.half = window_length // 2
+        self.seen = 0  # input values taken
+        self.done = 0  # output values returned
+        self._history = np.empty(0)  # input from max(0, done - window_length + 1) to seen
+
+    def _filter(self, segment):
+        return [savgol_filter(segment, self.window_length, self.polyorder, deriv=deriv, delta=self.delta,
+                              mode=self.mode, cval=self.cval) for deriv in self.derivs]
+
+    def _emit(self, segment, stop):
+        '''Filters segment and returns the outputs from done up to the absolute position stop.'''
+        start = self.seen - len(segment)  # absolute position of segment[0]
+        outputs = [values[self.done - start:stop - start] for values in self._filter(segment)]
+        self.done = stop
+        keep = max(0, self.done - self.window_length + 1)
+        self._history = segment[keep - start:].copy()
+        return outputs[0] if self.single else tuple(outputs)
+
+    def _empty(self):
+        empty = np.empty(0)
+        return empty if self.single else tuple(empty for _ in self.derivs)
+
+    def update(self, values):
+        '''Adds the next chunk. Returns the filtered values that are now complete, possibly empty.'''
+        segment = np.concatenate([self._history, np.asarray(values, dtype=float)])
+        self.seen += len(values)
+        stop = self.seen - self.half
+        if stop <= self.done or len(segment) < self.window_length:
+            self._history = segment
+            return self._empty()
+        return self._emit(segment, stop)
+
+    def finish(self):
+        '''Returns the last half window of filtered values, using the true end of the channel.'''
+        if self.done == self.seen:
+            return self._empty()
+        if len(self._history) < self.window_length:
+            raise ValueError(f'The channel has {self.seen} values, fewer than window_length')
+        return self._emit(self._history, self.seen)
+
+
+def savgol_chunks(chunks, window_length, polyorder, deriv=0, delta=1.0, mode='interp'):
+    '''Generator version of SavgolStream: yields the filtered output for an iterable of arrays.'''
+    stream = SavgolStream(window_length, polyorder, deriv, delta, mode)
+    for values in chunks:
+        output = stream.update(values)
+        if len(output if stream.single else output[0]):
+            yield output
+    yield stream.finish()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Fits the fluid property models to the MaterialProperties CSV files.
+
+fit_fluids() fits every property model of every fluid asked for in one call
+and reports how good each fit is. Results are saved in property_fits.json in
+the data folder, keyed by a sha256 of the CSV contents and the model, so a
+notebook rerun reuses them instantly and a fit is only redone when its data
+changes.
+
+    fits = fit_fluids(['EMIBF4', 'EMIBF2'])
+    print_fits(fits)
+    fits['EMIBF4', 'mu'].popt
+'''
+
+# import liberaries
+import hashlib
+import json
+
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from .atomic import atomic_write
+from .fluids import DEFAULT_DATA_FOLDER, PROPERTIES, property_file
+
+# define constants
+CACHE_FILE_NAME = 'property_fits.json'
+
+FitResult = namedtuple('FitResult', ['fluid', 'key', 'popt', 'perr', 'r_squared', 'rmse',
+                                     'max_relative_error', 'points', 'digest', 'cached'])
+
+
+def goodness_of_fit(model, popt, x, y):
+    '''Returns the R^2, RMSE and largest relative error of a fit.'''
+    residuals = y - model(x, *popt)
+    ss_res = float(np.sum(residuals**2))
+    ss_tot = float(np.sum((y - y.mean())**2))
+    r_squared = 1 - ss_res / ss_tot if ss_tot else float('nan')
+    rmse = float(np.sqrt(ss_res / len(y)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_relative_error = float(np.max(np.abs(residuals / y)))
+    return r_squared, rmse, max_relative_error
+
+
+def fit_property(prop, x, y):
+    '''Fits one property model. Returns popt, the standard errors of popt and the goodness of fit.'''
+    from scipy.optimize import curve_fit
+
+    popt, pcov = curve_fit(prop.model, x, y, p0=prop.p0, maxfev=20000)
+    perr = np.sqrt(np.diag(pcov))
+    return popt, perr, goodness_of_fit(prop.model, popt, x, y)
+
+
+def _cache_key(prop, digest):
+    return f'{prop.key}:{prop.model.__name__}:{digest}'
+
+
+def load_fits(data_folder=DEFAULT_DATA_FOLDER):
+    '''Returns the saved fits of a data folder.'''
+    try:
+        with open(Path(data_folder).joinpath(CACHE_FILE_NAME)) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_fits(saved, data_folder=DEFAULT_DATA_FOLDER):
+    with atomic_write(Path(data_folder).joinpath(CACHE_FILE_NAME), 'w') as file:
+        json.dump(saved, file, indent=1, sort_keys=True)
+
+
+def fit_fluids(fluids, data_folder=DEFAULT_DATA_FOLDER, refit=False):
+    '''
+    Fits every property of every fluid, reusing saved fits whose CSV has not
+    changed. Returns {(fluid, property key): FitResult}.
+    '''
+    from .tables import PROPERTY_SCHEMAS, parse_csv
+
+    saved = load_fits(data_folder)
+    results = {}
+    changed = False
+    for fluid in ([fluids] if isinstance(fluids, str) else fluids):
+        for prop in PROPERTIES:
+            with open(property_file(fluid, prop, data_folder), 'rb') as file:
+                data = file.read()
+            digest = hashlib.sha256(data).hexdigest()
+            key = _cache_key(prop, digest)
+            entry = None if refit else saved.get(key)
+            if entry is None:
+                df = parse_csv(data, PROPERTY_SCHEMAS[prop.key])
+                x = df['temp_K'].to_numpy(float)
+                y = df[prop.column].to_numpy(float)
+                popt, perr, (r_squared, rmse, max_relative_error) = fit_property(prop, x, y)
+                entry = saved[key] = {'popt': popt.tolist(), 'perr': perr.tolist(), 'r_squared': r_squared,
+                                      'rmse': rmse, 'max_relative_error': max_relative_error, 'points': len(x)}
+                changed = True
+                cached = False
+            else:
+                cached = True
+            results[fluid, prop.key] = FitResult(fluid, prop.key, np.array(entry['popt']), np.array(entry['perr']),
+                                                 entry['r_squared'], entry['rmse'], entry['max_relative_error'],
+                                                 entry['points'], digest, cached)
+    if changed:
+        save_fits(saved, data_folder)
+    return results
+
+
+def print_fits(results):
+    '''Prints the goodness of fit of each fitted property.'''
+    print('fluid\tproperty\tpoints\tR^2\t\tRMSE\t\tmax rel. error\tsource')
+    for fit in results.values():
+        print(f'{fit.fluid}\t{fit.key}\t\t{fit.points}\t{fit.r_squared:0.6f}\t{fit.rmse:0.3E}\t'
+              f'{fit.max_relative_error:0.2%}\t\t{"cache" if fit.cached else "fit"}')
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Temperature dependent fluid properties.
+
+A FluidProperties holds the fitted coefficients of the viscosity, density and
+surface tension models of one fluid, as arrays built once. tabulate() adds a
+table on a uniform temperature grid, after which a property is looked up in
+O(1) per value by linear interpolation between the two nearest grid points.
+Temperatures outside the table, and NaN, use the model. The table pays off for the
+scalar calls made in loops and solvers; on large arrays NumPy evaluates the
+models about as fast as it can gather from a table.
+
+load_fluid() fits a fluid from its MaterialProperties_<fluid>_<Property>.csv
+files in the data folder and keeps it, so several fluids can be compared side
+by side without fitting or allocating again:
+
+    emibf4 = load_fluid('EMIBF4', table=(temp_survive_low, temp_survive_high))
+    emibf2 = load_fluid('EMIBF2', table=(temp_survive_low, temp_survive_high))
+    emibf4.viscosity(temp_fit) - emibf2.viscosity(temp_fit)
+'''
+
+# import liberaries
+import os
+
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+# define constants
+DEFAULT_DATA_FOLDER = Path('../data')  # relative to the notebooks folder
+DEFAULT_TABLE_STEP = 0.05  # K
+
+
+def mu_temp_fit(x, a, b, c):
+    '''The form of the function that fits viscosity vs temperature data.'''
+    return a * x**b + c
+
+
+def rho_temp_fit(x, a, b):
+    '''The form of the function that fits density vs temperature data.'''
+    return a * x + b
+
+
+def sigma_temp_fit(x, a, b):
+    '''The form of the function that fits surface tension vs temperature data.'''
+    return a * x + b
+
+
+Property = namedtuple('Property', ['key', 'file_name', 'column', 'model', 'p0'])
+
+# EMIBF4 coefficients double as starting points for fitting other fluids
+PROPERTIES = (
+    Property('mu', 'Viscosity', 'mu_kg/m/s', mu_temp_fit, (5.58586277e+32, -1.38434792e+01, 6.56440863e-03)),
+    Property('rho', 'Density', 'rho_kg/m3', rho_temp_fit, (-7.92013082e-01, 1.51830091e+03)),
+    Property('sigma', 'SurfaceTension', 'sigma_kg/s^2', sigma_temp_fit, (-6.49547701e-05, 7.34300172e-02)),
+)
+MODELS = {prop.key: prop.model for prop in PROPERTIES}
+
+
+class FluidProperties:
+    '''Viscosity (kg/m/s), density (kg/m^3) and surface tension (kg/s^2) of a fluid vs temperature (K).'''
+
+    def __init__(self, name, coefficients):
+        self.name = name
+        self.coefficients = {key: np.asarray(coefficients[key], dtype=float) for key in MODELS}
+        self.table_range = None
+        self._tables = {}
+
+    def __repr__(self):
+        return f'FluidProperties({self.name!r})'
+
+    def tabulate(self, temp_low, temp_high, step=DEFAULT_TABLE_STEP):
+        '''Precomputes every property on a uniform grid from temp_low to temp_high. Returns self.'''
+        count = int(np.ceil((temp_high - temp_low) / step)) + 1
+        grid = temp_low + step * np.arange(count)
+        # values and slopes per grid interval, the last point repeated so temp_high needs no special case
+        self._tables = {}
+        for key in MODELS:
+            values = self.model(key, grid)
+            self._tables[key] = (values, np.append(np.diff(values), 0.0))
+        self.table_range = (float(temp_low), float(grid[-1]), float(step))
+        return self
+
+    def model(self, key, temp):
+        '''Evaluates the fitted model of a property.'''
+        return MODELS[key](np.asarray(temp, dtype=float), *self.coefficients[key])
+
+    def lookup(self, key, temp):
+        '''Returns a property at temp, from the table where there is one.'''
+        if self.table_range is None:
+            return self.model(key, temp)
+        low, high, step = self.table_range
+        values, slopes = self._tables[key]
+        if np.ndim(temp) == 0:
+            temp = float(temp)
+            if not low <= temp <= high:
+                return self.model(key, temp)
+            position = (temp - low) / step
+            index = int(position)
+            return values[index] + slopes[index] * (position - index)
+
+        temp = np.asarray(temp, dtype=float)
+        # False for NaN as well, so dropouts in a channel go to the model and come back NaN like scalars
+        inside = (temp >= low) & (temp <= high)
+        if not inside.all():
+            return np.where(inside, self.lookup(key, np.where(inside, temp, low)), self.model(key, temp))
+        position = temp - low
+        position /= step
+        index = position.astype(np.intp)
+        position -= index
+        result = slopes.take(index)
+        result *= position
+        result += values.take(index)
+        return result
+
+    def viscosity(self, temp):
+        '''Returns the viscosity (kg/m/s) given a temp (K).'''
+        return self.lookup('mu', temp)
+
+    def density(self, temp):
+        '''Returns the density (kg/m^3) given a temp (K).'''
+        return self.lookup('rho', temp)
+
+    def surface_tension(self, temp):
+        '''Returns the surface tension (kg/s^2) given a temp (K).'''
+        return self.lookup('sigma', temp)
+
+
+EMIBF4 = FluidProperties('EMIBF4', {prop.key: prop.p0 for prop in PROPERTIES})
+
+
+def property_file(fluid, prop, data_folder=DEFAULT_DATA_FOLDER):
+    return Path(data_folder).joinpath(f'MaterialProperties_{fluid}_{prop.file_name}.csv')
+
+
+def fit_fluid(fluid, data_folder=DEFAULT_DATA_FOLDER):
+    '''Fits every property model of a fluid to its MaterialProperties CSV files, see exptools.fitting.'''
+    from .fitting import fit_fluids
+
+    fits = fit_fluids([fluid], data_folder)
+    return FluidProperties(fluid, {key: fits[fluid, key].popt for key in MODELS})
+
+
+_fluids = {}
+
+
+def load_fluid(fluid, data_folder=DEFAULT_DATA_FOLDER, table=None, step=DEFAULT_TABLE_STEP):
+    '''
+    Returns the FluidProperties of a fluid, fitted from its CSV files and
+    tabulated over table=(temp_low, temp_high) if given. Fluids are kept
+    until one of their CSV files changes.
+    '''
+    stats = []
+    for prop in PROPERTIES:
+        stat = os.stat(property_file(fluid, prop, data_folder))
+        stats.append((stat.st_size, stat.st_mtime_ns))
+    key = (fluid, os.path.abspath(data_folder), tuple(stats), table and tuple(table), step)
+    if key not in _fluids:
+        properties = fit_fluid(fluid, data_folder)
+        if table is not None:
+            properties.tabulate(*table, step=step)
+        _fluids[key] = properties
+    return _fluids[key]
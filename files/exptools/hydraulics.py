@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Hydraulic resistance and volume of feed lines, vectorized.
+
+Every function broadcasts. Line lengths and radii have the lines on the last
+axis, any leading axes are design points. Viscosity and valve counts can be
+scalars or arrays, so a whole temperature grid times a range of valve counts
+is one call:
+
+    mu = viscosity_temp(temp_fit)[:, None]          # (temps, 1)
+    N_valve = np.arange(1, 11)[None, :]             # (1, valves)
+    R_h = R_h_model(mu, N_valve, L_lines, R_lines)  # (temps, valves)
+
+The viscosity is a common factor of every term, so the geometry of the lines
+is summed once and then scaled, instead of once per temperature.
+'''
+
+# import liberaries
+import numpy as np
+
+# define constants
+BETA_LFN = 6.83e-13  # LFN valve resistance per unit viscosity. Units: ?
+
+
+def line_factor(L_lines, R_lines):
+    '''Returns the sum over lines of 8 L / (pi R^4), the resistance of the lines per unit viscosity.'''
+    L_lines = np.asarray(L_lines, dtype=float)
+    R_lines = np.asarray(R_lines, dtype=float)
+    return np.sum(8 * L_lines / (np.pi * R_lines**4), axis=-1)
+
+
+def R_h_lines(mu, L_lines, R_lines):
+    '''Returns the summed hydraulic resistance of the lines for a viscosity mu (kg/m/s).'''
+    return np.asarray(mu) * line_factor(L_lines, R_lines)
+
+
+def R_h_model(mu, N_valve, L_lines, R_lines, beta=BETA_LFN):
+    '''Returns the hydraulic resistance of the lines and N_valve LFN valves for a viscosity mu (kg/m/s).'''
+    return np.asarray(mu) * (np.asarray(N_valve) * beta + line_factor(L_lines, R_lines))
+
+
+def volume_lines(L_lines, R_lines):
+    '''Returns the summed volume (m^3) of the lines.'''
+    L_lines = np.asarray(L_lines, dtype=float)
+    R_lines = np.asarray(R_lines, dtype=float)
+    return np.sum(np.pi * L_lines * R_lines**2, axis=-1)
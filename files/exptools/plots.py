@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Parallel, cached export of figures to the plot folder.
+
+A plot is a function that takes its data and returns a matplotlib Figure. A
+PlotJob pairs that function with its data and a file name. export_plots()
+hashes each job (the source of the function, the data and the save options)
+and only renders the jobs whose hash differs from the one recorded for the
+file in the plot folder, on a process pool with the Agg backend. Files are
+written to a hidden temporary name and renamed into place, so a report never
+picks up a half written plot. Only the plot function itself is hashed, so
+pass force=True after changing a helper it calls.
+
+    def plot_density(temp_fit, rho_df):
+        fig, ax = plt.subplots(figsize=[6, 2*GOLDEN_RATIO])
+        ...
+        return fig
+
+    export_plots([PlotJob('EMIBF4_density_temp_fit_C', plot_density, (temp_fit, rho_df))], plot_folder)
+
+Plot functions must be importable by the worker processes, i.e. defined in a
+module such as exptools or a .py file next to the notebook. Functions defined
+in the notebook itself are rendered in the notebook process instead.
+'''
+
+# import liberaries
+import hashlib
+import inspect
+import json
+import marshal
+import os
+import pickle
+import time
+
+from collections import namedtuple
+from pathlib import Path
+
+from .atomic import atomic_write
+
+# define constants
+HASH_FILE_NAME = '.plot_hashes.json'
+DEFAULT_SAVEFIG = {'bbox_inches': 'tight', 'transparent': True}
+
+PlotJob = namedtuple('PlotJob', ['name', 'function', 'args', 'kwargs'], defaults=((), {}))
+ExportResult = namedtuple('ExportResult', ['name', 'path', 'rendered', 'seconds'])
+
+
+def plot_path(plot_folder, name, plot_format='png'):
+    '''The path a plot is saved to, the same as the notebook's "Plot_<experiment_id>.<format>".'''
+    return Path(plot_folder).joinpath(f'Plot_{name}.{plot_format}')
+
+
+def job_hash(job, plot_format, dpi, savefig):
+    '''Hashes the code of a plot function, its data and the save options.'''
+    digest = hashlib.sha256()
+    try:
+        digest.update(inspect.getsource(job.function).encode())
+    except (OSError, TypeError):
+        digest.update(marshal.dumps(job.function.__code__))
+    digest.update(pickle.dumps((job.args, sorted(job.kwargs.items()), plot_format, dpi,
+                                sorted(savefig.items())), protocol=4))
+    return digest.hexdigest()
+
+
+def render(job, path, plot_format='png', dpi=600, savefig=None):
+    '''Renders one job and writes it atomically to path. Returns the seconds taken.'''
+    import matplotlib.pyplot as plt
+
+    began = time.perf_counter()
+    figure = job.function(*job.args, **job.kwargs)
+    try:
+        with atomic_write(path) as file:
+            figure.savefig(file, format=plot_format, dpi=dpi, **(DEFAULT_SAVEFIG if savefig is None else savefig))
+    finally:
+        plt.close(figure)
+    return time.perf_counter() - began
+
+
+def _render_worker(job, path, plot_format, dpi, savefig):
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    return render(job, path, plot_format, dpi, savefig)
+
+
+def _importable(function):
+    module = getattr(function, '__module__', None)
+    return module not in (None, '__main__') and '<locals>' not in getattr(function, '__qualname__', '<locals>')
+
+
+def load_hashes(plot_folder):
+    try:
+        with open(Path(plot_folder).joinpath(HASH_FILE_NAME)) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_hashes(plot_folder, hashes):
+    with atomic_write(Path(plot_folder).joinpath(HASH_FILE_NAME), 'w') as file:
+        json.dump(hashes, file, indent=1, sort_keys=True)
+
+
+def export_plots(jobs, plot_folder, plot_format='png', dpi=600, savefig=None, workers=None, force=False):
+    '''
+    Renders the jobs whose inputs changed since they were last saved to
+    plot_folder, in parallel where the plot function allows it. Returns an
+    ExportResult per job, in order.
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+
+    savefig = DEFAULT_SAVEFIG if savefig is None else savefig
+    plot_folder = Path(plot_folder)
+    plot_folder.mkdir(parents=True, exist_ok=True)
+    hashes = load_hashes(plot_folder)
+
+    results = {}
+    pending = []
+    for job in jobs:
+        path = plot_path(plot_folder, job.name, plot_format)
+        digest = job_hash(job, plot_format, dpi, savefig)
+        if not force and hashes.get(path.name) == digest and path.exists():
+            results[job.name] = ExportResult(job.name, path, False, 0.0)
+        else:
+            pending.append((job, path, digest))
+
+    parallel = [item for item in pending if _importable(item[0].function)]
+    local = [item for item in pending if not _importable(item[0].function)]
+    workers = min(workers or os.cpu_count() or 1, len(parallel))
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [(item, pool.submit(_render_worker, item[0], item[1], plot_format, dpi, savefig))
+                           for item in parallel]
+                for (job, path, digest), future in futures:
+                    results[job.name] = ExportResult(job.name, path, True, future.result())
+                    hashes[path.name] = digest
+        else:
+            local = parallel + local
+        for job, path, digest in local:
+            results[job.name] = ExportResult(job.name, path, True, render(job, path, plot_format, dpi, savefig))
+            hashes[path.name] = digest
+    finally:
+        save_hashes(plot_folder, hashes)
+    return [results[job.name] for job in jobs]
+
+
+def print_exports(results):
+    '''Prints which plots were rendered and which were up to date.'''
+    for result in results:
+        status = f'rendered in {result.seconds:0.2f} s' if result.rendered else 'up to date'
+        print(f'{result.path.name}:\t{status}')
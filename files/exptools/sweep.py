@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Memoized design sweeps of the hydraulic resistance model.
+
+sweep_R_h() evaluates R_h_model over the Cartesian product of temperatures,
+valve counts, and the length and radius of a feed line, in chunks across a
+process pool. Every point computed is kept in a compressed labelled array
+file (.npz) in the data folder: one sorted coordinate array per parameter and
+the R_h grid over them, NaN where a point has not been computed. A later
+sweep only computes the points the file does not have yet, so widening a
+range or refining a grid costs only the new points:
+
+    sweep = sweep_R_h(temp=temp_fit, N_valve=np.arange(1, 11),
+                      L_line=np.arange(0.05, 0.55, 0.05), R_line=np.array([0.25E-3, 0.4E-3, 0.5E-3]))
+    sweep.R_h[:, 0, 2, 1]  # R_h vs temperature, 1 valve, 0.15 m of 0.5 mm line
+
+Points are matched by exact value, so build ranges the same way each time
+(e.g. np.arange with the same step) to reuse them. Lines that are the same in
+every design go in lines=(L_lines, R_lines) and are added to the swept line.
+The file is tied to the fluid, the fixed lines and beta; changing any of them
+starts a new sweep in it.
+'''
+
+# import liberaries
+import hashlib
+import os
+import pickle
+
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from .atomic import atomic_write
+from .hydraulics import BETA_LFN, R_h_model
+
+# define constants
+DEFAULT_SWEEP_FILE = Path('../data/R_h_sweep.npz')  # relative to the notebooks folder
+DEFAULT_CHUNK_SIZE = 100_000  # points per task
+AXES = ('temp', 'N_valve', 'L_line', 'R_line')
+
+Sweep = namedtuple('Sweep', AXES + ('R_h', 'computed'))
+
+
+def _model_key(fluid, lines, beta):
+    '''Identifies everything besides the swept parameters that R_h depends on.'''
+    coefficients = fluid.coefficients['mu']
+    return hashlib.sha256(pickle.dumps((fluid.name, coefficients.tolist(), [np.asarray(part, dtype=float).tolist()
+                                        for part in lines], float(beta)), protocol=4)).hexdigest()
+
+
+def _evaluate(fluid, lines, beta, points):
+    '''Returns R_h of an (n, 4) array of (temp, N_valve, L_line, R_line) points.'''
+    L_fixed, R_fixed = (np.broadcast_to(np.asarray(part, dtype=float), (len(points), len(np.atleast_1d(part))))
+                        for part in lines)
+    L_lines = np.column_stack([points[:, 2], L_fixed])
+    R_lines = np.column_stack([points[:, 3], R_fixed])
+    return R_h_model(fluid.model('mu', points[:, 0]), points[:, 1], L_lines, R_lines, beta)
+
+
+def load_sweep(path=DEFAULT_SWEEP_FILE, key=None):
+    '''Returns the ({axis: coordinates}, R_h grid) saved in a sweep file, or None if there is none for key.'''
+    try:
+        with np.load(path) as saved:
+            if key is not None and str(saved['key']) != key:
+                return None
+            return {axis: saved[axis] for axis in AXES}, saved['R_h']
+    except (FileNotFoundError, KeyError, ValueError, OSError):
+        return None
+
+
+def save_sweep(coords, R_h, key, path=DEFAULT_SWEEP_FILE):
+    with atomic_write(path) as file:
+        np.savez_compressed(file, key=np.array(key), R_h=R_h, **coords)
+
+
+def sweep_R_h(temp, N_valve, L_line, R_line, fluid=None, lines=((), ()), beta=BETA_LFN, path=DEFAULT_SWEEP_FILE,
+              workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Returns R_h (Pa s/m^3) over the product of temp (K), N_valve, L_line (m)
+    and R_line (m), computing only the points not saved in path yet. fluid is
+    a FluidProperties, by default EMIBF4. The returned Sweep has the sorted,
+    unique values of each parameter, the R_h grid over them and the number of
+    points computed in this call.
+    '''
+    if fluid is None:
+        from .fluids import EMIBF4
+        fluid = EMIBF4
+
+    requested = {axis: np.unique(np.asarray(values, dtype=float)) for axis, values in
+                 zip(AXES, (temp, N_valve, L_line, R_line))}
+    key = _model_key(fluid, lines, beta)
+
+    # grow the saved grid to cover the requested coordinates, new points are NaN
+    saved = load_sweep(path, key)
+    if saved is None:
+        coords = requested
+        R_h = np.full([len(coords[axis]) for axis in AXES], np.nan)
+    else:
+        old_coords, old_R_h = saved
+        coords = {axis: np.union1d(old_coords[axis], requested[axis]) for axis in AXES}
+        R_h = np.full([len(coords[axis]) for axis in AXES], np.nan)
+        R_h[np.ix_(*[np.searchsorted(coords[axis], old_coords[axis]) for axis in AXES])] = old_R_h
+
+    index = np.ix_(*[np.searchsorted(coords[axis], requested[axis]) for axis in AXES])
+    block = R_h[index]
+    missing = np.flatnonzero(np.isnan(block))
+    if len(missing):
+        positions = np.unravel_index(missing, block.shape)
+        points = np.column_stack([requested[axis][position] for axis, position in zip(AXES, positions)])
+        chunks = [points[start:start + chunk_size] for start in range(0, len(points), chunk_size)]
+        workers = min(workers or os.cpu_count() or 1, len(chunks))
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                values = list(pool.map(_evaluate, *zip(*[(fluid, lines, beta, chunk) for chunk in chunks])))
+        else:
+            values = [_evaluate(fluid, lines, beta, chunk) for chunk in chunks]
+        block.flat[missing] = np.concatenate(values)
+        R_h[index] = block
+        save_sweep(coords, R_h, key, path)
+
+    return Sweep(*[requested[axis] for axis in AXES], block, len(missing))
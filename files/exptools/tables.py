@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Typed, cached CSV loading.
+
+read_csv() parses a CSV with declared column types, so pandas does not have
+to infer them, and with the pyarrow engine when pyarrow is installed. The
+parsed columns are saved next to the CSV as a hidden numpy archive
+(.<name>.cache.npz) and reused until the CSV, the schema or the options
+change, so a large logger file picked with get_data_file() is only parsed
+once:
+
+    mu_df = read_csv('../data/MaterialProperties_EMIBF4_Viscosity.csv', VISCOSITY_SCHEMA)
+    log_df = read_csv(get_data_file())
+    log_df = read_csv(get_data_file(), sep='\t')  # a tab separated logger .txt
+
+A schema maps column names to dtypes. Only the columns in the schema are
+read; without a schema every column is read and its type inferred.
+
+The cache holds plain typed arrays and is loaded without pickle, so it does
+not depend on the pandas version that wrote it, and a cache that can not be
+read for any reason is parsed again. Numeric, boolean, datetime and text
+columns are cached; a table with other column types is parsed every time.
+'''
+
+# import liberaries
+import io
+import json
+import os
+
+from pathlib import Path
+
+from .atomic import atomic_write
+from .fluids import PROPERTIES
+
+# define constants
+CACHE_SUFFIX = '.cache.npz'
+
+try:
+    import pyarrow  # noqa: F401, only needed by the pandas pyarrow engine
+    DEFAULT_ENGINE = 'pyarrow'
+except ImportError:
+    DEFAULT_ENGINE = 'c'
+
+# schemas of the MaterialProperties_<fluid>_<Property>.csv files
+PROPERTY_SCHEMAS = {prop.key: {'temp_K': 'float64', prop.column: 'float64'} for prop in PROPERTIES}
+VISCOSITY_SCHEMA = PROPERTY_SCHEMAS['mu']
+DENSITY_SCHEMA = PROPERTY_SCHEMAS['rho']
+SURFACE_TENSION_SCHEMA = PROPERTY_SCHEMAS['sigma']
+
+
+def parse_csv(source, schema=None, dropna=True, engine=DEFAULT_ENGINE, **kwargs):
+    '''Parses a CSV file, path or bytes with the declared schema. No caching.'''
+    import pandas as pd
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if 'delimiter' not in kwargs:
+        kwargs.setdefault('sep', ',')
+    if schema is not None:
+        kwargs.setdefault('usecols', list(schema))
+        kwargs.setdefault('dtype', dict(schema))
+    try:
+        df = pd.read_csv(source, engine=engine, **kwargs)
+    except (ValueError, ImportError):
+        if engine == 'c':
+            raise
+        # an option the pyarrow engine does not support
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        df = pd.read_csv(source, engine='c', **kwargs)
+    return df.dropna() if dropna else df
+
+
+def cache_path(path):
+    path = Path(path)
+    return path.with_name(f'.{path.name}{CACHE_SUFFIX}')
+
+
+def _encode(values, name, arrays):
+    '''
+    Stores a column or index in arrays under name. Returns its dtype, or
+    None when it can not be stored as plain arrays.
+    '''
+    import numpy as np
+
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind not in 'OV':
+        arrays[name] = np.asarray(values)
+        return str(dtype)
+    if str(dtype) not in ('object', 'str', 'string'):
+        return None
+    # text, with a mask of the missing values
+    missing = np.asarray(values.isna(), dtype=bool)
+    text = np.array(values, dtype=object)
+    if not all(isinstance(value, str) for value in text[~missing]):
+        return None
+    text[missing] = ''
+    arrays[name] = text.astype(str)
+    arrays[f'{name}_missing'] = missing
+    return str(dtype)
+
+
+def _decode(archive, name):
+    '''Returns the values stored by _encode(), missing text as NaN like pandas.read_csv.'''
+    values = archive[name]
+    if f'{name}_missing' not in archive:
+        return values
+    values = values.astype(object)
+    values[archive[f'{name}_missing']] = float('nan')
+    return values
+
+
+def save_cache(path, df, key):
+    '''
+    Writes df and its key to the cache file at path. Returns False, without
+    writing, when a column can not be stored as plain arrays.
+    '''
+    import numpy as np
+    import pandas as pd
+
+    names = list(df.columns)
+    if (isinstance(df.columns, pd.MultiIndex) or isinstance(df.index, pd.MultiIndex)
+            or not all(isinstance(name, (str, int)) for name in names + [df.index.name or ''])):
+        return False
+    arrays = {}
+    dtypes = [_encode(df.iloc[:, column], f'c{column}', arrays) for column in range(len(names))]
+    if isinstance(df.index, pd.RangeIndex):
+        index = {'range': [df.index.start, df.index.stop, df.index.step]}
+    else:
+        index = {'dtype': _encode(df.index, 'index', arrays)}
+    if None in dtypes or index.get('dtype', '') is None:
+        return False
+    index['name'] = df.index.name
+    meta = {'key': key, 'columns': names, 'dtypes': dtypes, 'index': index}
+
+    try:
+        with atomic_write(path) as file:
+            np.savez(file, meta=np.array(json.dumps(meta)), **arrays)
+    except OSError:  # read only data folder, just do not cache
+        return False
+    return True
+
+
+def load_cache(path, key):
+    '''Returns the DataFrame cached at path for key, None when there is none.'''
+    import numpy as np
+    import pandas as pd
+
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            # only the key is read from a stale cache
+            meta = json.loads(str(archive['meta']))
+            if meta['key'] != key:
+                return None
+            df = pd.DataFrame({column: pd.Series(_decode(archive, f'c{column}'), dtype=dtype)
+                               for column, dtype in enumerate(meta['dtypes'])})
+            index = meta['index']
+            if 'range' in index:
+                df.index = pd.RangeIndex(*index['range'], name=index['name'])
+            else:
+                df.index = pd.Index(_decode(archive, 'index'), dtype=index['dtype'], name=index['name'])
+        df.columns = meta['columns']
+        return df
+    except Exception:  # a missing, partial, foreign or corrupt cache is parsed again
+        return None
+
+
+def read_csv(path, schema=None, dropna=True, cache=True, **kwargs):
+    '''
+    Returns the DataFrame of a CSV, from its binary cache when the CSV has
+    not changed since it was cached. kwargs are passed to pandas.read_csv.
+    '''
+    path = Path(path)
+    stat = os.stat(path)
+    if 'delimiter' not in kwargs:
+        kwargs.setdefault('sep', ',')  # part of the key, a file read with another separator is parsed again
+    # the key as it reads back from json
+    key = json.loads(json.dumps([stat.st_size, stat.st_mtime_ns, sorted((schema or {}).items()), dropna,
+                                 sorted(kwargs.items())], default=repr))
+    cached = cache_path(path)
+    if cache:
+        df = load_cache(cached, key)
+        if df is not None:
+            return df
+
+    df = parse_csv(path, schema, dropna, **kwargs)
+    if cache:
+        save_cache(cached, df, key)
+    return df
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Streaming reader for TDMS files.
+
+TdmsFile.read() loads every channel of a file into memory, which does not
+work for the multi-GB files of long test runs. iter_chunks() opens the file
+with TdmsFile.open(), which only reads the metadata, and yields the selected
+channels chunk_size values at a time. Each chunk is copied into one buffer
+per channel that is allocated once and reused, so peak memory is about
+chunk_size values per channel whatever the size of the file.
+
+    for chunk in iter_files(get_tdms_files(), [('Data', 'Pressure')]):
+        pressure = chunk.data['Data', 'Pressure']
+        ...
+
+The arrays in a chunk are views of the reused buffers and are overwritten
+by the next chunk. Copy them (or reduce them) before moving on.
+'''
+
+# import liberaries
+import ctypes
+import os
+import time
+
+import numpy as np
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from nptdms import TdmsFile
+
+# define constants
+DEFAULT_CHUNK_SIZE = 1_000_000  # values per channel per chunk, 8 MB of float64
+
+TdmsChunk = namedtuple('TdmsChunk', ['path', 'start', 'data'])
+FileInfo = namedtuple('FileInfo', ['path', 'lengths', 'dtypes', 'start'])
+FileStats = namedtuple('FileStats', ['path', 'values', 'nbytes', 'seconds'])
+
+
+def select_channels(tdms_file, channels=None):
+    '''
+    Returns {(group, channel): TdmsChannel} for a list of (group, channel)
+    names, or for every channel of the file when channels is None.
+    '''
+    if channels is None:
+        return {(group.name, channel.name): channel for group in tdms_file.groups() for channel in group.channels()}
+    selected = {}
+    for group, channel in channels:
+        try:
+            selected[group, channel] = tdms_file[group][channel]
+        except KeyError:
+            raise KeyError(f'No channel {channel!r} in group {group!r}') from None
+    return selected
+
+
+def channel_lengths(path, channels=None):
+    '''Returns {(group, channel): number of values} read from the metadata only.'''
+    with TdmsFile.open(path) as tdms_file:
+        return {key: len(channel) for key, channel in select_channels(tdms_file, channels).items()}
+
+
+def iter_chunks(path, channels=None, chunk_size=DEFAULT_CHUNK_SIZE, scaled=True):
+    '''
+    Yields TdmsChunk(path, start, data) for one TDMS file, where data maps
+    (group, channel) to the values start to start + chunk_size. Channels
+    that are shorter than the longest one give empty arrays once they end.
+    '''
+    with TdmsFile.open(path) as tdms_file:
+        selected = select_channels(tdms_file, channels)
+        lengths = {key: len(channel) for key, channel in selected.items()}
+        buffers = {}
+        for start in range(0, max(lengths.values(), default=0), chunk_size):
+            data = {}
+            for key, channel in selected.items():
+                length = max(0, min(chunk_size, lengths[key] - start))
+                if length == 0:
+                    data[key] = np.empty(0, dtype=buffers[key].dtype if key in buffers else np.float64)
+                    continue
+                values = channel.read_data(start, length, scaled=scaled)
+                buffer = buffers.get(key)
+                if buffer is None or buffer.dtype != values.dtype:
+                    buffer = buffers[key] = np.empty(chunk_size, dtype=values.dtype)
+                buffer[:length] = values
+                data[key] = buffer[:length]
+                del values
+            yield TdmsChunk(path, start, data)
+
+
+def iter_files(paths, channels=None, chunk_size=DEFAULT_CHUNK_SIZE, scaled=True):
+    '''Chains iter_chunks() over a list of files, e.g. the output of get_tdms_files().'''
+    for path in paths:
+        yield from iter_chunks(path, channels, chunk_size, scaled)
+
+
+def describe_file(path, channels=None, time_channel=None):
+    '''
+    Reads the metadata of a file. Returns FileInfo(path, lengths, dtypes, start)
+    where start is the first value of time_channel, or the wf_start_time of
+    the first selected channel that has one, or None.
+    '''
+    with TdmsFile.open(path) as tdms_file:
+        selected = select_channels(tdms_file, channels)
+        lengths = {key: len(channel) for key, channel in selected.items()}
+        dtypes = {key: np.dtype(channel.dtype) for key, channel in selected.items()}
+        start = None
+        if time_channel is not None:
+            channel = select_channels(tdms_file, [time_channel])[time_channel]
+            if len(channel):
+                start = channel.read_data(0, 1)[0]
+        else:
+            for channel in selected.values():
+                start = channel.properties.get('wf_start_time')
+                if start is not None:
+                    break
+    return FileInfo(path, lengths, dtypes, start)
+
+
+def _attach(name):
+    '''
+    Attaches to a shared memory block created by load_files(). In a worker
+    process the block is left out of the resource tracker, which would
+    otherwise report the parent's block as leaked when the worker exits.
+    '''
+    import multiprocessing
+    from multiprocessing.shared_memory import SharedMemory
+
+    if multiprocessing.parent_process() is None:
+        return SharedMemory(name=name)
+    try:
+        return SharedMemory(name=name, track=False)  # python 3.13+
+    except TypeError:
+        block = SharedMemory(name=name)
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class SharedArrayOwner:
+    '''
+    Keeps a shared memory block alive for the array load_files() returns for
+    it. The array is a view of the block, so no copy is made; the block is
+    closed when the last array or view of it is garbage collected.
+    '''
+
+    def __init__(self, block, length, dtype):
+        # take the address without holding a buffer export, so close() can run later
+        pointer = ctypes.c_char.from_buffer(block.buf)
+        address = ctypes.addressof(pointer)
+        del pointer
+        self._block = block
+        self.__array_interface__ = {'shape': (length,), 'typestr': np.dtype(dtype).str,
+                                    'data': (address, False), 'version': 3}
+
+    def __del__(self):
+        self._block.close()
+
+
+def _stream_into(path, arrays, offsets, chunk_size):
+    '''Streams a file into arrays[key] from offsets[key] on. Returns its FileStats.'''
+    began = time.perf_counter()
+    values = 0
+    nbytes = 0
+    for chunk in iter_chunks(path, list(arrays), chunk_size):
+        for key, data in chunk.data.items():
+            start = offsets[key] + chunk.start
+            arrays[key][start:start + len(data)] = data
+            values += len(data)
+            nbytes += data.nbytes
+    return FileStats(path, values, nbytes, time.perf_counter() - began)
+
+
+def _decode_into(path, targets, chunk_size):
+    '''
+    Worker for load_files(). Streams a file into its slice of the shared
+    output arrays. targets maps (group, channel) to (shared memory name,
+    dtype, total length, offset of this file).
+    '''
+    blocks = []
+    views = {}
+    try:
+        for key, (name, dtype, total, offset) in targets.items():
+            blocks.append(_attach(name))
+            views[key] = np.ndarray(total, dtype=dtype, buffer=blocks[-1].buf)
+        return _stream_into(path, views, {key: target[3] for key, target in targets.items()}, chunk_size)
+    finally:
+        views.clear()
+        for block in blocks:
+            block.close()
+
+
+def load_files(paths, channels=None, workers=None, time_channel=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Loads the segment files of one test across a process pool. Files are put
+    in order of their start timestamp (see describe_file, the given order is
+    kept when a file has none) and each channel is returned as one contiguous
+    array. Workers decode straight into their slice of a shared memory block,
+    so no per-file arrays are built and joined, and the returned arrays are
+    views of those blocks, so peak memory is one copy of the data. Blocks are
+    unlinked as soon as the workers are done and freed with their arrays.
+    Without multiprocessing.shared_memory (python 3.7) the files are loaded
+    one after the other in this process.
+    Returns ({(group, channel): array}, [FileStats per file in load order]).
+    '''
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError:
+        SharedMemory = None
+
+    paths = [str(path) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1)) if SharedMemory is not None else 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        mapper = pool.map if pool is not None else map
+        infos = list(mapper(describe_file, paths, [channels] * len(paths), [time_channel] * len(paths)))
+        if infos and all(info.start is not None for info in infos):
+            infos.sort(key=lambda info: info.start)
+
+        keys = list(infos[0].lengths) if infos else []
+        for info in infos:
+            if set(info.lengths) != set(keys):
+                raise KeyError(f'{info.path} does not have the same channels as {infos[0].path}')
+        totals = {key: sum(info.lengths[key] for info in infos) for key in keys}
+        dtypes = {key: np.result_type(*[info.dtypes[key] for info in infos]) for key in keys}
+        offsets = []  # where each file starts in the output arrays
+        position = dict.fromkeys(keys, 0)
+        for info in infos:
+            offsets.append(dict(position))
+            for key in keys:
+                position[key] += info.lengths[key]
+        if SharedMemory is None:
+            data = {key: np.empty(totals[key], dtype=dtypes[key]) for key in keys}
+            stats = [_stream_into(info.path, data, offset, chunk_size) for info, offset in zip(infos, offsets)]
+            return data, stats
+
+        blocks = {}
+        try:
+            for key in keys:
+                blocks[key] = SharedMemory(create=True, size=max(1, totals[key] * dtypes[key].itemsize))
+            jobs = [{key: (blocks[key].name, dtypes[key].str, totals[key], offset[key]) for key in keys}
+                    for offset in offsets]
+            stats = list(mapper(_decode_into, [info.path for info in infos], jobs, [chunk_size] * len(infos)))
+            data = {key: np.asarray(SharedArrayOwner(blocks[key], totals[key], dtypes[key])) for key in keys}
+        except BaseException:
+            for block in blocks.values():
+                block.close()
+            raise
+        finally:
+            # the names go now, the memory when the arrays do
+            for block in blocks.values():
+                block.unlink()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return data, stats
+
+
+def print_throughput(stats):
+    '''Prints the decode throughput of each file loaded by load_files().'''
+    for stat in stats:
+        rate = stat.nbytes / stat.seconds / 1e6 if stat.seconds else float('inf')
+        print(f'{os.path.basename(stat.path)}:\t{stat.values:,} values\t{stat.seconds:0.3f} s\t{rate:0.1f} MB/s')
+    seconds = sum(stat.seconds for stat in stats)
+    nbytes = sum(stat.nbytes for stat in stats)
+    if seconds:
+        print(f'total:\t{nbytes / 1e6:0.1f} MB decoded in {seconds:0.3f} worker s, {nbytes / seconds / 1e6:0.1f} MB/s per worker')
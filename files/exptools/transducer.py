@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Pressure transducer conversion for streamed data.
+
+A 4-20 mA transducer is linear between (Ilow, Plow) and (Ihigh, Phigh), so
+its slope and intercept follow directly from the two points. A Calibration
+works them out once. With a shunt resistance the raw values are the volts
+read across the shunt, and the division by the resistance is folded into the
+slope.
+
+TransducerConverter holds the calibrations of many channels and converts raw
+buffers to psi in place, in blocks small enough to stay in the CPU cache, so
+the scale and the offset cost one pass over memory and nothing is allocated.
+float32 buffers stay float32. It plugs straight into the streaming reader:
+
+    converter = TransducerConverter({('Data', 'PT1'): Calibration(Phigh=45),
+                                     ('Data', 'PT2'): Calibration(Plow=0, Phigh=100)})
+    for chunk in converter.iter_convert(iter_files(get_tdms_files())):
+        ...
+'''
+
+# import liberaries
+from collections import namedtuple
+
+import numpy as np
+
+from .units import BLOCK_SIZE, scale_offset
+
+
+class Calibration(namedtuple('Calibration', ['Ilow', 'Ihigh', 'Plow', 'Phigh', 'resistance'])):
+    '''
+    Two point calibration of a transducer, currents in Amps and pressures in
+    psi. resistance is the shunt in Ohms when the raw data is a voltage.
+    '''
+    __slots__ = ()
+
+    def __new__(cls, Ilow=4E-3, Ihigh=20E-3, Plow=-14.7, Phigh=45, resistance=None):
+        return super().__new__(cls, Ilow, Ihigh, Plow, Phigh, resistance)
+
+    @property
+    def slope(self):
+        '''psi per raw unit.'''
+        slope = (self.Phigh - self.Plow) / (self.Ihigh - self.Ilow)
+        return slope if self.resistance is None else slope / self.resistance
+
+    @property
+    def intercept(self):
+        '''psi at a raw value of zero.'''
+        return self.Plow - (self.Phigh - self.Plow) / (self.Ihigh - self.Ilow) * self.Ilow
+
+
+class TransducerConverter:
+    '''Converts raw channels to psi with one Calibration per channel.'''
+
+    def __init__(self, calibrations):
+        self.calibrations = dict(calibrations)
+        self._coefficients = {key: (calibration.slope, calibration.intercept)
+                              for key, calibration in self.calibrations.items()}
+
+    def convert(self, key, values, out=None):
+        '''
+        Converts the raw values of one channel. In place unless out is given,
+        in which case values is left alone and out is filled and returned.
+        '''
+        slope, intercept = self._coefficients[key]
+        return scale_offset(values, slope, intercept, out)
+
+    def convert_data(self, data):
+        '''Converts, in place, every calibrated channel of a {key: array} dict. Returns data.'''
+        for key, values in data.items():
+            if key in self._coefficients and len(values):
+                self.convert(key, values)
+        return data
+
+    def convert_stack(self, keys, block, block_size=BLOCK_SIZE):
+        '''
+        Converts, in place, a 2-D (channels, samples) buffer whose rows are
+        the channels in keys. All channels are scaled in the same pass.
+        '''
+        slopes = np.array([self._coefficients[key][0] for key in keys], dtype=block.dtype)[:, None]
+        intercepts = np.array([self._coefficients[key][1] for key in keys], dtype=block.dtype)[:, None]
+        step = max(1, block_size // max(len(keys), 1))
+        for start in range(0, block.shape[1], step):
+            part = block[:, start:start + step]
+            part *= slopes
+            part += intercepts
+        return block
+
+    def iter_convert(self, chunks):
+        '''Converts each TdmsChunk of a stream (see exptools.tdms) in place as it passes.'''
+        for chunk in chunks:
+            self.convert_data(chunk.data)
+            yield chunk
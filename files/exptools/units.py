@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Unit conversions as fused scale and offset kernels.
+
+Every conversion is a Linear, values * scale + offset, and is called like the
+old functions: Pa_to_psi(P_spring_DTB). Arrays are converted one cache sized
+block at a time into a single output, which can be given with out= (out may
+be the input itself), and float32 data stays float32.
+
+Chained conversions are combined into one Linear before touching the data,
+so a long time series is swept once instead of once per step:
+
+    to_ml = chain(Linear(A_bore), mmm_to_ml)    # instead of mmm_to_ml(x_DTB * A_bore)
+    volume = to_ml(x_DTB)
+    K_to_C.then(C_to_K)(temp, out=temp)          # in place, no temporaries
+'''
+
+# import liberaries
+from collections import namedtuple
+from functools import reduce
+
+import numpy as np
+
+# define constants
+BLOCK_SIZE = 1 << 16  # values converted per pass, fits in the L2 cache
+PSI = 6894.76  # Pa
+ZERO_C = 272.15  # K, as used by the original K_to_C and C_to_K
+
+
+def scale_offset(values, scale, offset=0.0, out=None, block_size=BLOCK_SIZE):
+    '''
+    Returns values * scale + offset, computed one cache sized block at a
+    time into out, which defaults to values itself (in place).
+    '''
+    if out is None:
+        out = values
+    source = np.asarray(values).reshape(-1)
+    target = out.reshape(-1)  # a view for contiguous buffers
+    if target.size and not np.may_share_memory(target, out):
+        raise ValueError('out can not be flattened without a copy')
+    for start in range(0, len(target), block_size):
+        block = target[start:start + block_size]
+        if scale == 1:
+            np.copyto(block, source[start:start + block_size], casting='same_kind')
+        else:
+            np.multiply(source[start:start + block_size], scale, out=block, casting='same_kind')
+        if offset:
+            block += offset
+    return out
+
+
+class Linear(namedtuple('Linear', ['scale', 'offset', 'name'])):
+    '''The conversion values * scale + offset.'''
+    __slots__ = ()
+
+    def __new__(cls, scale=1.0, offset=0.0, name=None):
+        return super().__new__(cls, scale, offset, name)
+
+    def __repr__(self):
+        return self.name or f'Linear({self.scale!r}, {self.offset!r})'
+
+    def then(self, other):
+        '''Returns the single conversion that applies self and then other.'''
+        return Linear(self.scale * other.scale, self.offset * other.scale + other.offset,
+                      f'{self!r} -> {other!r}')
+
+    def __call__(self, values, out=None):
+        if out is None:
+            if isinstance(values, (list, tuple)):
+                values = np.asarray(values)
+            if not isinstance(values, np.ndarray):
+                # numbers and pandas objects
+                result = values * self.scale if self.scale != 1 else values
+                return result + self.offset if self.offset else result
+            out = np.empty(values.shape, dtype=np.result_type(values, 1.0))
+        return scale_offset(values, self.scale, self.offset, out)
+
+
+def chain(*conversions):
+    '''Fuses conversions, applied left to right, into one Linear.'''
+    return reduce(Linear.then, conversions[1:], conversions[0])
+
+
+psi_to_Pa = Linear(PSI, name='psi_to_Pa')
+Pa_to_psi = Linear(1 / PSI, name='Pa_to_psi')
+K_to_C = Linear(1.0, -ZERO_C, name='K_to_C')
+C_to_K = Linear(1.0, ZERO_C, name='C_to_K')
+mmmps_to_mlps = Linear(1e6, name='mmmps_to_mlps')  # m^3/s to ml/s
+mmm_to_ml = Linear(1e6, name='mmm_to_ml')  # m^3 to ml
+ml_to_mmm = Linear(1e-6, name='ml_to_mmm')  # ml to m^3
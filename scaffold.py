@@ -0,0 +1,572 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+GUI-free engine that builds experiment folder structures.
+
+The Tk window in experiment_start.py and the command line below share this
+module, so a single experiment and a batch manifest are built the same way.
+
+Command line use:
+    python scaffold.py build manifest.csv --master-folder D:\\experiments
+    python scaffold.py build manifest.json --workers 16
+    python scaffold.py search pump --master-folder D:\\experiments
+'''
+
+# import liberaries
+import csv
+import errno
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from structure_profiles import DEFAULT_PROFILE, ProfileError, load_profile
+from template_store import TEMPLATES
+
+# define constants
+DEFAULT_WORKERS = 8
+
+
+def make_kernal_name(date_string, experiment_name):
+    '''Returns the experiment kernal name "<date> - <name>".'''
+    return ''.join([date_string, ' - ', experiment_name.replace(' ', '_')])
+
+
+@dataclass(frozen=True)
+class Experiment:
+    '''
+    Everything needed to build one experiment folder structure.
+
+    folders are folder keys of the structure profile, such as 'data' or
+    'images/JPG', plus any custom folder names. files are file keys of the
+    profile. None means the profile defaults.
+    '''
+    master_folder: str
+    date: str
+    name: str
+    profile: str = DEFAULT_PROFILE
+    folders: tuple = None
+    files: tuple = None
+
+    @property
+    def kernal(self):
+        return make_kernal_name(self.date, self.name)
+
+    @property
+    def path(self):
+        return Path(self.master_folder).joinpath(self.kernal)
+
+
+@dataclass
+class BuildResult:
+    '''Outcome of building one experiment.'''
+    experiment: Experiment
+    created: list = field(default_factory=list)
+    existing: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    cancelled: bool = False
+
+    @property
+    def ok(self):
+        return not self.errors and not self.cancelled
+
+
+@dataclass(frozen=True)
+class ScaffoldPlan:
+    '''
+    Every directory and file of one experiment, deduplicated and in creation
+    order. Directories are listed parents first and every file has its final
+    name, so applying a plan never needs a stat, rename or second pass.
+    '''
+    root: Path
+    directories: tuple = ()
+    copies: tuple = ()
+    writes: tuple = ()
+    create_root: bool = True
+
+    @property
+    def operations(self):
+        return int(self.create_root) + len(self.directories) + len(self.copies) + len(self.writes)
+
+
+def check_templates(profile, keys, templates=TEMPLATES):
+    '''Raises ProfileError naming every selected file option whose template is not in the template folder.'''
+    missing = {}
+    for key in keys:
+        option = profile.file_options.get(key)
+        if option is None:
+            raise ProfileError(f'Unknown file selection for profile {profile.name}: {key}')
+        for copy in option.copies:
+            if not templates.folder.joinpath(copy.template).is_file():
+                missing.setdefault(key, []).append(copy.template)
+    if missing:
+        details = '; '.join(f'{key}: {", ".join(names)}' for key, names in missing.items())
+        raise ProfileError(f'Profile {profile.name} selects templates that are not in {templates.folder} ({details})')
+
+
+def plan_experiment(experiment, templates=TEMPLATES):
+    '''
+    Works out the folders and files to create for an experiment from its
+    profile. Raises ProfileError before anything is built when a selected
+    template is missing.
+    '''
+    profile = load_profile(experiment.profile)
+    root = experiment.path
+    fields = {'kernal': experiment.kernal, 'date': experiment.date, 'name': experiment.name}
+    selected_folders = profile.default_folders if experiment.folders is None else experiment.folders
+    selected_files = profile.default_files if experiment.files is None else experiment.files
+
+    check_templates(profile, selected_files, templates)
+
+    folders = profile.folder_keys(selected_folders)
+    copies = {}
+    writes = {}
+    for key in selected_files:
+        option = profile.file_options[key]
+        for copy in option.copies:
+            target = root.joinpath(copy.folder, copy.rename.format(template=copy.template, **fields))
+            copies[target] = copy.template
+            folders.append(target.parent.relative_to(root))
+        for write in option.writes:
+            target = root.joinpath(write.folder, write.target.format(**fields))
+            writes[target] = write.text.format(**fields)
+            folders.append(target.parent.relative_to(root))
+
+    # a file target implies its folder, and a nested folder implies its parents
+    directories = set()
+    for folder in folders:
+        path = root.joinpath(folder)
+        while path != root:
+            directories.add(path)
+            path = path.parent
+
+    return ScaffoldPlan(root=root,
+                        directories=tuple(sorted(directories, key=lambda path: (len(path.parts), path))),
+                        copies=tuple((name, target) for target, name in copies.items()),
+                        writes=tuple(writes.items()))
+
+
+class LocalFS:
+    '''
+    The filesystem calls the engine makes on the master folder. Everything
+    that touches the target goes through one of these methods, so benchmarks
+    can count the calls and add latency (see benchmarks/bench_scaffold.py).
+    '''
+
+    def mkdir(self, path):
+        os.mkdir(path)
+
+    def place(self, templates, name, target):
+        return templates.place(name, target)
+
+    def write_text(self, target, text):
+        with open(target, 'w') as file:
+            file.write(text)
+
+    def scandir(self, path):
+        return os.scandir(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def rename(self, source, target):
+        os.rename(source, target)
+
+    def copytree(self, source, target):
+        shutil.copytree(source, target, copy_function=shutil.copyfile)
+
+
+LOCAL_FS = LocalFS()
+
+
+def _mkdir(path, result, fs):
+    try:
+        fs.mkdir(path)
+        result.created.append(path)
+    except FileExistsError:
+        result.existing.append(path)
+    except OSError as error:
+        result.errors.append(f'{path}: {error}')
+
+
+def _copy(templates, name, target, result, fs):
+    try:
+        fs.place(templates, name, target)
+        result.created.append(target)
+    except OSError as error:
+        result.errors.append(f'{target.name}: {error}')
+
+
+def _write(target, text, result, fs):
+    try:
+        fs.write_text(target, text)
+        result.created.append(target)
+    except OSError as error:
+        result.errors.append(f'{target.name}: {error}')
+
+
+def apply_plan(plan, result, templates=TEMPLATES, progress=None, cancel=None, fs=LOCAL_FS):
+    '''
+    Creates everything in a plan with one filesystem call per entry.
+
+    progress(done, total, description) is called after every step and the
+    build stops early once the cancel threading.Event is set.
+    '''
+    steps = [(plan.root.name, _mkdir, (plan.root, result, fs))] if plan.create_root else []
+    steps.extend((path.relative_to(plan.root).as_posix(), _mkdir, (path, result, fs))
+                 for path in plan.directories)
+    steps.extend((target.name, _copy, (templates, name, target, result, fs))
+                 for name, target in plan.copies)
+    steps.extend((target.name, _write, (target, text, result, fs))
+                 for target, text in plan.writes)
+
+    for done, (description, function, arguments) in enumerate(steps, 1):
+        if cancel is not None and cancel.is_set():
+            result.cancelled = True
+            break
+        function(*arguments)
+        if progress is not None:
+            progress(done, len(steps), description)
+        if done == 1 and plan.create_root and result.errors:
+            break
+    return result
+
+
+def scan_existing(plan, fs=LOCAL_FS):
+    '''
+    Lists what already exists of a plan. Reads the tree with one os.scandir
+    per planned folder that exists, and never descends into other folders.
+    '''
+    wanted = set(plan.directories)
+    existing = set()
+    pending = [plan.root]
+    while pending:
+        folder = pending.pop()
+        try:
+            with fs.scandir(folder) as entries:
+                for entry in entries:
+                    path = folder.joinpath(entry.name)
+                    existing.add(path)
+                    if path in wanted and entry.is_dir():
+                        pending.append(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return existing
+
+
+def repair_plan(plan, existing):
+    '''Returns the part of a plan that is missing. Existing files are never overwritten.'''
+    return ScaffoldPlan(root=plan.root,
+                        directories=tuple(path for path in plan.directories if path not in existing),
+                        copies=tuple((name, target) for name, target in plan.copies if target not in existing),
+                        writes=tuple((target, text) for target, text in plan.writes if target not in existing),
+                        create_root=False)
+
+
+def repair_experiment(experiment, plan, result, progress=None, cancel=None, fs=LOCAL_FS):
+    '''
+    Brings an existing experiment up to its plan. Only missing folders and
+    files are created, so templates the user has edited are left alone and
+    re-running on a complete tree costs one scandir per folder.
+    '''
+    existing = scan_existing(plan, fs)
+    result.existing.append(plan.root)
+    result.existing.extend(path for path in plan.directories if path in existing)
+    result.existing.extend(target for _, target in plan.copies if target in existing)
+    result.existing.extend(target for target, _ in plan.writes if target in existing)
+    missing = repair_plan(plan, existing)
+    if missing.operations == 0:
+        if progress is not None:
+            progress(1, 1, 'nothing missing')
+        return result
+    return apply_plan(missing, result, progress=progress, cancel=cancel, fs=fs)
+
+
+def publish_tree(staged, target, fs=LOCAL_FS):
+    '''
+    Moves a staged experiment folder to target so it appears complete or not
+    at all. On the same volume this is one directory rename. Across volumes
+    the tree is copied to a hidden sibling of target and renamed into place.
+    Returns 'rename' or 'copy'.
+    '''
+    try:
+        fs.rename(staged, target)
+        return 'rename'
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+
+    partial = target.with_name(f'.{target.name}.partial-{os.getpid()}-{threading.get_ident()}')
+    try:
+        fs.copytree(staged, partial)
+        fs.rename(partial, target)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    shutil.rmtree(staged, ignore_errors=True)
+    return 'copy'
+
+
+def _rebase(paths, old_root, new_root):
+    return [new_root.joinpath(path.relative_to(old_root)) for path in paths]
+
+
+def rebase_plan(plan, root):
+    '''Returns the same plan with every path moved from plan.root to root.'''
+    return ScaffoldPlan(root=root,
+                        directories=tuple(_rebase(plan.directories, plan.root, root)),
+                        copies=tuple(zip([name for name, _ in plan.copies],
+                                         _rebase([target for _, target in plan.copies], plan.root, root))),
+                        writes=tuple(zip(_rebase([target for target, _ in plan.writes], plan.root, root),
+                                         [text for _, text in plan.writes])),
+                        create_root=plan.create_root)
+
+
+def build_staged(experiment, progress=None, cancel=None, staging_folder=None, fs=LOCAL_FS):
+    '''
+    Builds an experiment in a local staging folder, then publishes it to the
+    master folder in one bulk step. Use build_experiment(stage=True).
+    Only the publish step goes through fs, the staging folder is local.
+
+    The plan is made, and its templates checked, before the staging folder
+    is, so staging only starts for a build that can succeed. A build that
+    still fails or is cancelled is discarded, nothing reaches the master folder.
+    '''
+    result = BuildResult(experiment)
+    target_plan = plan_experiment(experiment)
+    stage_root = Path(tempfile.mkdtemp(prefix='scaffold-', dir=staging_folder))
+    try:
+        plan = rebase_plan(target_plan, stage_root.joinpath(experiment.kernal))
+
+        def staged_progress(done, total, description):
+            if progress is not None:
+                progress(done, total + 1, description)
+
+        apply_plan(plan, result, progress=staged_progress, cancel=cancel)
+        if not result.ok:
+            # the staged tree is discarded, so nothing was created
+            result.created = []
+            return result
+
+        try:
+            publish_tree(plan.root, experiment.path, fs)
+        except OSError as error:
+            result.errors.append(f'Could not publish {experiment.kernal}: {error}')
+            result.created = []
+            return result
+        result.created = _rebase(result.created, plan.root, experiment.path)
+        if progress is not None:
+            progress(plan.operations + 1, plan.operations + 1, f'published {experiment.kernal}')
+        return result
+    finally:
+        shutil.rmtree(stage_root, ignore_errors=True)
+
+
+def build_experiment(experiment, progress=None, cancel=None, stage=False, staging_folder=None, fs=LOCAL_FS):
+    '''
+    Creates the folder structure and template files for one experiment.
+
+    An experiment that already exists is repaired: only what is missing is
+    created and existing files are never overwritten.
+
+    With stage=True a new experiment is built in staging_folder (the system
+    temp folder by default) and moved to the master folder in one step, so a
+    slow network share only sees the final transfer.
+    '''
+    exists = fs.isdir(experiment.path)
+    if stage and not exists:
+        try:
+            return build_staged(experiment, progress, cancel, staging_folder, fs)
+        except ValueError as error:
+            return BuildResult(experiment, errors=[str(error)])
+
+    result = BuildResult(experiment)
+    try:
+        plan = plan_experiment(experiment)
+    except ValueError as error:
+        result.errors.append(str(error))
+        return result
+    if exists:
+        return repair_experiment(experiment, plan, result, progress=progress, cancel=cancel, fs=fs)
+    return apply_plan(plan, result, progress=progress, cancel=cancel, fs=fs)
+
+
+def build_batch(experiments, workers=DEFAULT_WORKERS, stage=False, staging_folder=None, fs=LOCAL_FS):
+    '''Builds many experiments concurrently and returns results in input order.'''
+    from concurrent.futures import ThreadPoolExecutor  # imported here to keep GUI start up fast
+
+    def build(experiment):
+        return build_experiment(experiment, stage=stage, staging_folder=staging_folder, fs=fs)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(build, experiments))
+
+
+class BuildWorker:
+    '''
+    Builds queued experiments one at a time on a background thread.
+
+    Nothing here touches Tk. The GUI polls events with root.after and gets
+    ('queued', experiment, pending), ('progress', experiment, done, total,
+    description) and ('done', result) tuples.
+    '''
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self._jobs = queue.Queue()
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name='scaffold-worker', daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        '''Number of experiments queued or being built.'''
+        return self._pending
+
+    def submit(self, experiment, **options):
+        '''Queues an experiment. options are passed on to build_experiment.'''
+        with self._lock:
+            self._pending += 1
+            self.events.put(('queued', experiment, self._pending))
+            self._jobs.put((experiment, options))
+
+    def cancel(self):
+        '''Stops the running build and drops everything still queued.'''
+        with self._lock:
+            while True:
+                try:
+                    experiment, _ = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending -= 1
+                result = BuildResult(experiment, cancelled=True)
+                self.events.put(('done', result))
+            if self._pending:
+                self._cancel.set()
+
+    def _run(self):
+        while True:
+            experiment, options = self._jobs.get()
+
+            def progress(done, total, description, experiment=experiment):
+                self.events.put(('progress', experiment, done, total, description))
+
+            result = build_experiment(experiment, progress=progress, cancel=self._cancel, **options)
+            with self._lock:
+                self._pending -= 1
+                self._cancel.clear()
+                self.events.put(('done', result))
+
+
+def _split(value, default=None):
+    '''Turns a "a;b;c" manifest cell into a tuple. Empty cells use the default.'''
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return tuple(item.strip() for item in value.split(';') if item.strip())
+    return tuple(value)
+
+
+def _experiment_from_record(record, master_folder, profile_name):
+    profile_name = record.get('profile') or profile_name
+    profile = load_profile(profile_name)
+    folders = _split(record.get('folders'))
+    image_folders = _split(record.get('image_folders'))
+    if image_folders is not None:
+        # older manifests list image format folders in their own column
+        folders = (profile.default_folders if folders is None else folders) + tuple(
+            f'images/{folder}' for folder in image_folders)
+    return Experiment(master_folder=record.get('master_folder') or master_folder,
+                      date=record.get('date') or datetime.today().strftime('%Y-%m-%d'),
+                      name=record['name'],
+                      profile=profile_name,
+                      folders=folders,
+                      files=_split(record.get('files')))
+
+
+def load_manifest(path, master_folder=None, profile=DEFAULT_PROFILE):
+    '''
+    Reads a CSV or JSON manifest and returns a list of Experiments.
+
+    Each record has a name and optionally date, master_folder, profile,
+    folders and files. In CSV files list cells are separated by ';'.
+    '''
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path) as file:
+            records = json.load(file)
+        if isinstance(records, dict):
+            master_folder = records.get('master_folder', master_folder)
+            profile = records.get('profile', profile)
+            records = records['experiments']
+    else:
+        with open(path, newline='') as file:
+            records = list(csv.DictReader(file))
+
+    experiments = [_experiment_from_record(record, master_folder, profile) for record in records]
+    for experiment in experiments:
+        if not experiment.master_folder:
+            raise ValueError(f'No master folder given for {experiment.kernal}')
+    return experiments
+
+
+def search_index(master_folder, text, limit=50, full=False):
+    '''Refreshes the experiment index of a master folder and prints matches.'''
+    from experiment_index import ExperimentIndex
+    index = ExperimentIndex(master_folder)
+    added, updated, removed = index.refresh(full)
+    print(f'{len(index)} experiments indexed ({added} added, {updated} updated, {removed} removed).')
+    for record in index.search(text, limit):
+        print(f'{record.kernal}\t{record.file_count} files\t{", ".join(record.structure)}')
+    index.close()
+    return 0
+
+
+def main(argv=None):
+    import argparse  # imported here to keep GUI start up fast
+    parser = argparse.ArgumentParser(description='Build experiment folder structures.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='build every experiment in a manifest')
+    build.add_argument('manifest', help='CSV or JSON manifest of experiments')
+    build.add_argument('--master-folder', help='parent folder for records that do not set one')
+    build.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='number of build threads')
+    build.add_argument('--profile', default=DEFAULT_PROFILE, help='structure profile for records that do not set one')
+    build.add_argument('--stage', action='store_true', help='build locally, then publish each experiment in one step')
+    build.add_argument('--staging-folder', help='local folder to build in (default: system temp folder)')
+
+    search = commands.add_parser('search', help='search the experiment index of a master folder')
+    search.add_argument('text', nargs='?', default='', help='part of the experiment kernal name')
+    search.add_argument('--master-folder', required=True, help='master folder to search')
+    search.add_argument('--limit', type=int, default=50, help='maximum number of matches')
+    search.add_argument('--full', action='store_true', help='rescan every experiment instead of only changed ones')
+
+    args = parser.parse_args(argv)
+    if args.command == 'search':
+        return search_index(args.master_folder, args.text, args.limit, args.full)
+
+    experiments = load_manifest(args.manifest, args.master_folder, args.profile)
+    results = build_batch(experiments, args.workers, args.stage, args.staging_folder)
+
+    failed = 0
+    for result in results:
+        status = 'ok' if result.ok else 'FAILED'
+        print(f'{status}\t{result.experiment.path}\t{len(result.created)} created, {len(result.existing)} existing')
+        for error in result.errors:
+            print(f'\t{error}')
+        failed += not result.ok
+    print(f'{len(results) - failed} of {len(results)} experiments built.')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Declarative structure profiles.
+
+A profile is a JSON (or TOML) file in profiles/ that lists the folders,
+custom folders and files an experiment can have, with their defaults and
+the rename rules of each template. See profiles/default.json.
+
+load_profile() compiles a profile once into an immutable Profile with every
+lookup table the planner needs, and caches it until the file changes, so the
+GUI and the batch engine get a ready plan object without re-reading files or
+walking option lists.
+
+Rename rules and note texts are format strings. Fields: {kernal}, {date},
+{name} and, for copies, {template} (the template file name).
+'''
+
+# import liberaries
+import json
+import os
+
+from collections import namedtuple
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:  # TOML profiles need python 3.11 or the tomli package
+        tomllib = None
+
+# define constants
+PROFILE_FOLDER = Path(__file__).resolve().parent.joinpath('profiles')
+PROFILE_SUFFIXES = ('.json', '.toml')
+DEFAULT_PROFILE = 'default'
+
+FolderOption = namedtuple('FolderOption', ['key', 'label', 'parent', 'default'])
+FileOption = namedtuple('FileOption', ['key', 'label', 'column', 'default', 'copies', 'writes'])
+Copy = namedtuple('Copy', ['template', 'folder', 'rename'])
+Write = namedtuple('Write', ['folder', 'target', 'text'])
+
+
+class ProfileError(ValueError):
+    '''Raised for a missing or malformed structure profile.'''
+
+
+@dataclass(frozen=True, eq=False)
+class Profile:
+    '''A compiled structure profile.'''
+    name: str
+    description: str
+    path: Path
+    folders: tuple
+    custom_folders: tuple
+    file_columns: tuple
+    files: tuple
+    # lookup tables built by compile_profile
+    folder_parents: dict
+    file_options: dict
+    default_folders: tuple
+    default_files: tuple
+
+    def folder_keys(self, selected):
+        '''
+        Returns the selected folder keys that will be created. Profile folders
+        are dropped when their parent is not selected. Any other name is a
+        custom folder and is kept as long as it stays inside the experiment.
+        '''
+        selected = tuple(dict.fromkeys(selected))
+        chosen = set(selected)
+        keys = []
+        for key in selected:
+            if key in self.folder_parents:
+                parent = self.folder_parents[key]
+                if parent is not None and parent not in chosen:
+                    continue
+            else:
+                check_relative(key)
+            keys.append(key)
+        return keys
+
+
+def check_relative(folder):
+    '''Raises ProfileError unless folder is a plain relative path inside the experiment.'''
+    path = Path(folder)
+    if not folder or path.is_absolute() or path.drive or '..' in path.parts:
+        raise ProfileError(f'Folder must stay inside the experiment: {folder!r}')
+
+
+def _read(path):
+    if path.suffix == '.toml':
+        if tomllib is None:
+            raise ProfileError(f'{path.name}: TOML profiles need python 3.11 or the tomli package')
+        with open(path, 'rb') as file:
+            return tomllib.load(file)
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _folder_options(entries, parent=None):
+    for entry in entries:
+        key = entry['name'] if parent is None else f'{parent}/{entry["name"]}'
+        check_relative(key)
+        yield FolderOption(key, entry.get('label', entry['name']), parent, bool(entry.get('default', False)))
+        yield from _folder_options(entry.get('children', ()), key)
+
+
+def compile_profile(data, path=None):
+    '''Turns a parsed profile into a Profile. Raises ProfileError on bad input.'''
+    try:
+        folders = tuple(_folder_options(data.get('folders', ())))
+        custom_folders = tuple((entry['name'], bool(entry.get('default', False)))
+                               for entry in data.get('custom_folders', ()))
+        files = []
+        for entry in data.get('files', ()):
+            copies = tuple(Copy(copy['template'], copy.get('folder', ''), copy.get('rename', '{template}'))
+                           for copy in entry.get('copies', ()))
+            writes = tuple(Write(write.get('folder', ''), write['target'], write.get('text', ''))
+                           for write in entry.get('writes', ()))
+            for item in copies + writes:
+                if item.folder:
+                    check_relative(item.folder)
+            files.append(FileOption(entry['key'], entry.get('label', entry['key']), int(entry.get('column', 0)),
+                                    bool(entry.get('default', False)), copies, writes))
+    except (KeyError, TypeError, ValueError) as error:
+        if isinstance(error, ProfileError):
+            raise
+        raise ProfileError(f'{path or "profile"}: bad entry {error}') from None
+
+    return Profile(name=Path(path).stem if path else data.get('name', DEFAULT_PROFILE),
+                   description=data.get('description', ''),
+                   path=Path(path) if path else None,
+                   folders=folders,
+                   custom_folders=custom_folders,
+                   file_columns=tuple(data.get('file_columns', ())),
+                   files=tuple(files),
+                   folder_parents={option.key: option.parent for option in folders},
+                   file_options={option.key: option for option in files},
+                   default_folders=tuple([option.key for option in folders if option.default]
+                                         + [name for name, default in custom_folders if default]),
+                   default_files=tuple(option.key for option in files if option.default))
+
+
+@lru_cache(maxsize=None)
+def _load(path, mtime_ns, size):
+    return compile_profile(_read(path), path)
+
+
+def find_profile(name):
+    '''Returns the path of a profile given its name or a path to it.'''
+    path = Path(name)
+    if path.suffix in PROFILE_SUFFIXES and path.exists():
+        return path.resolve()
+    for suffix in PROFILE_SUFFIXES:
+        path = PROFILE_FOLDER.joinpath(f'{name}{suffix}')
+        if path.exists():
+            return path
+    raise ProfileError(f'No structure profile called {name!r} in {PROFILE_FOLDER}')
+
+
+def load_profile(name=DEFAULT_PROFILE):
+    '''Returns the compiled Profile for a name or path. Cached until the file changes.'''
+    if isinstance(name, Profile):
+        return name
+    path = find_profile(name)
+    stat = os.stat(path)
+    return _load(path, stat.st_mtime_ns, stat.st_size)
+
+
+def list_profiles():
+    '''Returns the names of the profiles in the profiles folder.'''
+    return sorted({path.stem for path in PROFILE_FOLDER.iterdir() if path.suffix in PROFILE_SUFFIXES})
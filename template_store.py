@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Content-addressed cache of the template files in files/.
+
+Templates are found next to this module, so building experiments works from
+any working directory. Each template is read and hashed once; its bytes are
+kept in memory keyed by the hash, so identical templates share one buffer and
+placing a template never re-reads it from disk.
+
+Placement tries the cheapest option the filesystem supports and falls back:
+    1. hardlink (only when link=True, edits would change every copy)
+    2. reflink, a copy-on-write clone (Linux btrfs/xfs)
+    3. os.copy_file_range, an in-kernel or server side copy
+    4. one buffered write of the cached bytes
+'''
+
+# import liberaries
+import errno
+import hashlib
+import os
+import threading
+
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# define constants
+TEMPLATE_FOLDER = Path(__file__).resolve().parent.joinpath('files')
+
+FICLONE = 0x40049409  # linux/fs.h, _IOW(0x94, 9, int)
+
+# errors meaning "this filesystem can not do that", as opposed to a real failure
+UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP,
+               errno.ENOSYS, errno.EBADF, errno.EPERM}
+
+Template = namedtuple('Template', ['name', 'path', 'digest', 'size', 'mtime_ns'])
+
+
+class TemplateStore:
+    '''Resolves, hashes and places template files.'''
+
+    def __init__(self, folder=TEMPLATE_FOLDER, link=False):
+        self.folder = Path(folder)
+        self.link = link
+        self._templates = {}
+        self._blobs = {}
+        self._unsupported = set()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        '''Returns the Template for a file name, reading it on first use.'''
+        path = self.folder.joinpath(name)
+        stat = os.stat(path)
+        with self._lock:
+            template = self._templates.get(name)
+            if template is not None and (template.size, template.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                return template
+
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.sha256(data).hexdigest()
+        template = Template(name, path, digest, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            self._blobs.setdefault(digest, data)
+            self._templates[name] = template
+        return template
+
+    def data(self, name):
+        '''Returns the cached bytes of a template.'''
+        return self._blobs[self.get(name).digest]
+
+    def place(self, name, target):
+        '''Puts a copy of a template at target and returns the method used.'''
+        template = self.get(name)
+        if self.link:
+            try:
+                os.link(template.path, target)
+                return 'hardlink'
+            except OSError as error:
+                if error.errno not in UNSUPPORTED:
+                    raise
+
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            if template.size and (fcntl is not None or hasattr(os, 'copy_file_range')):
+                method = self._clone(template, fd)
+                if method:
+                    return method
+            data = self._blobs[template.digest]
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            return 'copy'
+        finally:
+            os.close(fd)
+
+    def _clone(self, template, fd):
+        '''Tries reflink then copy_file_range into fd. Returns None if neither works.'''
+        device = os.fstat(fd).st_dev
+        source = os.open(template.path, os.O_RDONLY)
+        try:
+            if fcntl is not None and ('reflink', device) not in self._unsupported:
+                try:
+                    fcntl.ioctl(fd, FICLONE, source)
+                    return 'reflink'
+                except OSError as error:
+                    if error.errno not in UNSUPPORTED:
+                        raise
+                    self._unsupported.add(('reflink', device))
+
+            if hasattr(os, 'copy_file_range') and ('copy_file_range', device) not in self._unsupported:
+                remaining = template.size
+                try:
+                    while remaining:
+                        copied = os.copy_file_range(source, fd, remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                except OSError as error:
+                    if error.errno not in UNSUPPORTED:
+                        raise
+                    self._unsupported.add(('copy_file_range', device))
+                    os.ftruncate(fd, 0)
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    return None
+                if remaining == 0:
+                    return 'copy_file_range'
+                os.ftruncate(fd, 0)
+                os.lseek(fd, 0, os.SEEK_SET)
+            return None
+        finally:
+            os.close(source)
+
+
+# shared store used by the scaffold engine
+TEMPLATES = TemplateStore()
@@ -0,0 +1,11 @@
+# coding: utf-8
+'''Makes the modules in the repository root and the exptools package importable from the tests.'''
+
+# import liberaries
+import sys
+
+from pathlib import Path
+
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_FOLDER))
+sys.path.insert(0, str(REPO_FOLDER.joinpath('files')))
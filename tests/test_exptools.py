@@ -0,0 +1,431 @@
+# coding: utf-8
+'''Checks of the claims the exptools analysis helpers make, on small generated data.'''
+
+# import liberaries
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scipy.signal import savgol_filter
+
+from exptools import cache as tdms_cache
+from exptools import tables
+from exptools.accumulator import (Accumulator, load_accumulators, plot_max_flow_rate, plot_spring_pressure,
+                                  solve_accumulators)
+from exptools.atomic import atomic_write
+from exptools.cache import TdmsCache
+from exptools.decimate import MinMaxDecimator, decimate_tdms, minmax
+from exptools.family import plot_family
+from exptools.filters import SavgolStream, savgol_chunks
+from exptools.fluids import EMIBF4, FluidProperties
+from exptools.hydraulics import BETA_LFN, R_h_model, volume_lines
+from exptools.plots import PlotJob, export_plots
+from exptools.sweep import sweep_R_h
+from exptools.tables import VISCOSITY_SCHEMA, cache_path, read_csv
+from exptools.tdms import iter_chunks, load_files
+from exptools.transducer import Calibration, TransducerConverter
+from exptools.units import BLOCK_SIZE, C_to_K, K_to_C, Linear, Pa_to_psi, chain, mmm_to_ml, psi_to_Pa
+
+
+def write_tdms(path, channels):
+    '''Writes {(group, channel): values} to a TDMS file.'''
+    from nptdms import ChannelObject, TdmsWriter
+
+    with TdmsWriter(str(path)) as writer:
+        writer.write_segment([ChannelObject(group, name, np.asarray(values)) for (group, name), values in
+                              channels.items()])
+    return path
+
+
+def entry_size(cache):
+    return sum(file.stat().st_size for file in cache.folder.rglob('*.npy'))
+
+
+# TDMS cache
+
+def test_cache_hit_does_not_open_the_raw_file(tmp_path, monkeypatch):
+    path = write_tdms(tmp_path.joinpath('run.tdms'), {('Data', 'Pressure'): np.arange(100.0),
+                                                      ('Data', 'Temp'): np.ones(50)})
+    cache = TdmsCache(tmp_path.joinpath('cache'))
+    first = cache.load(path)
+
+    def opened(*args, **kwargs):
+        raise AssertionError('the raw file was opened on a cache hit')
+    monkeypatch.setattr(tdms_cache, 'channel_lengths', opened)
+    monkeypatch.setattr(tdms_cache, 'iter_chunks', opened)
+    second = cache.load(path)
+
+    assert list(second) == list(first) == [('Data', 'Pressure'), ('Data', 'Temp')]
+    np.testing.assert_array_equal(second['Data', 'Pressure'], np.arange(100.0))
+    cache.close()
+
+
+def test_cache_invalidates_when_the_file_changes(tmp_path):
+    path = tmp_path.joinpath('run.tdms')
+    write_tdms(path, {('Data', 'Pressure'): np.arange(10.0)})
+    cache = TdmsCache(tmp_path.joinpath('cache'))
+    old = cache.digest(path)
+    np.testing.assert_array_equal(cache.load(path)['Data', 'Pressure'], np.arange(10.0))
+
+    write_tdms(path, {('Data', 'Pressure'): np.arange(20.0) * 2})
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    np.testing.assert_array_equal(cache.load(path)['Data', 'Pressure'], np.arange(20.0) * 2)
+    assert not cache.folder.joinpath(old).exists()
+    cache.close()
+
+
+def test_cache_size_is_the_size_on_disk(tmp_path):
+    path = write_tdms(tmp_path.joinpath('run.tdms'), {('Data', 'Pressure'): np.arange(1000.0),
+                                                      ('Data', 'Temp'): np.arange(500.0)})
+    cache = TdmsCache(tmp_path.joinpath('cache'))
+    cache.load(path, [('Data', 'Pressure')])
+    cache.load(path, [('Data', 'Temp')])
+    # a retried conversion of the same channel
+    cache._convert(path, cache.digest(path), [('Data', 'Pressure')])
+    assert cache.nbytes == entry_size(cache)
+    cache.close()
+
+
+# streaming TDMS reader
+
+def test_iter_chunks_streams_the_whole_channel_through_one_buffer(tmp_path):
+    pressure = np.random.default_rng(11).normal(size=10_050)
+    path = write_tdms(tmp_path.joinpath('run.tdms'), {('Data', 'Pressure'): pressure,
+                                                      ('Data', 'Temp'): np.arange(4_000.0)})
+    parts = {('Data', 'Pressure'): [], ('Data', 'Temp'): []}
+    buffers = set()
+    for chunk in iter_chunks(path, chunk_size=1_000):
+        for key, values in chunk.data.items():
+            parts[key].append(values.copy())
+        buffers.add(chunk.data['Data', 'Pressure'].__array_interface__['data'][0])
+    np.testing.assert_array_equal(np.concatenate(parts['Data', 'Pressure']), pressure)
+    np.testing.assert_array_equal(np.concatenate(parts['Data', 'Temp']), np.arange(4_000.0))
+    assert len(parts['Data', 'Temp']) == 11 and len(parts['Data', 'Temp'][-1]) == 0
+    assert len(buffers) == 1
+
+
+# parallel TDMS loading
+
+@pytest.fixture
+def segment_files(tmp_path):
+    '''Three segment files of one test, named out of time order.'''
+    paths = []
+    for index, start in enumerate([2, 0, 1]):
+        path = tmp_path.joinpath(f'segment_{index}.tdms')
+        write_tdms(path, {('Data', 'Time'): np.arange(start * 100, start * 100 + 100, dtype=float),
+                          ('Data', 'Pressure'): np.full(100 + start, float(start))})
+        paths.append(path)
+    return paths
+
+
+def test_load_files_joins_segments_in_time_order(segment_files):
+    data, stats = load_files(segment_files, workers=2, time_channel=('Data', 'Time'))
+    np.testing.assert_array_equal(data['Data', 'Time'], np.arange(300.0))
+    np.testing.assert_array_equal(data['Data', 'Pressure'], np.repeat([0.0, 1.0, 2.0], [100, 101, 102]))
+    assert [os.path.basename(stat.path) for stat in stats] == ['segment_1.tdms', 'segment_2.tdms', 'segment_0.tdms']
+
+
+def test_load_files_without_shared_memory(segment_files, monkeypatch):
+    expected, _ = load_files(segment_files, workers=2, time_channel=('Data', 'Time'))
+    # python 3.7 has no multiprocessing.shared_memory
+    monkeypatch.setitem(sys.modules, 'multiprocessing.shared_memory', None)
+    data, stats = load_files(segment_files, workers=2, time_channel=('Data', 'Time'))
+    assert len(stats) == 3
+    for key in expected:
+        np.testing.assert_array_equal(data[key], expected[key])
+
+
+# hydraulics
+
+def test_R_h_model_broadcasts_like_a_loop_over_designs():
+    mu = EMIBF4.viscosity(np.linspace(260.0, 360.0, 7))
+    N_valve = np.arange(1, 5)
+    L_lines = np.array([[0.3, 0.1], [0.5, 0.0]])
+    R_lines = np.array([[0.4e-3, 0.25e-3], [0.5e-3, 1.0]])
+    R_h = R_h_model(mu[:, None, None], N_valve[None, :, None], L_lines[None, None, :, :], R_lines[None, None, :, :])
+    assert R_h.shape == (7, 4, 2)
+    for i, viscosity in enumerate(mu):
+        for j, valves in enumerate(N_valve):
+            for k in range(2):
+                lines = sum(8 * viscosity * L / (np.pi * R**4) for L, R in zip(L_lines[k], R_lines[k]))
+                assert R_h[i, j, k] == pytest.approx(valves * BETA_LFN * viscosity + lines, rel=1e-12)
+    np.testing.assert_allclose(volume_lines(L_lines, R_lines), np.sum(np.pi * L_lines * R_lines**2, axis=-1))
+
+
+# fluid properties
+
+def test_tabulated_lookup_matches_the_model():
+    fluid = FluidProperties('EMIBF4', EMIBF4.coefficients).tabulate(233.15, 373.15)
+    temp = np.array([200.0, 233.15, 250.0, 300.123, 373.15, 400.0])
+    np.testing.assert_allclose(fluid.viscosity(temp), EMIBF4.model('mu', temp), rtol=1e-4)
+    np.testing.assert_allclose(fluid.density(temp), EMIBF4.model('rho', temp), rtol=1e-9)
+    assert fluid.surface_tension(300.123) == pytest.approx(EMIBF4.model('sigma', 300.123), rel=1e-9)
+
+
+def test_tabulated_lookup_of_nan_is_nan():
+    fluid = FluidProperties('EMIBF4', EMIBF4.coefficients).tabulate(233.15, 373.15)
+    viscosity = fluid.viscosity(np.array([300.0, np.nan, np.inf]))
+    assert viscosity[0] == pytest.approx(fluid.viscosity(300.0))
+    assert np.isnan(viscosity[1]) and np.isnan(fluid.viscosity(float('nan')))
+    assert np.isnan(fluid.density(np.array([np.nan, np.nan]))).all()
+
+
+# transducer conversion
+
+def test_transducer_converts_in_place_and_keeps_float32():
+    converter = TransducerConverter({'PT1': Calibration(Phigh=45), 'PT2': Calibration(Plow=0, Phigh=100, resistance=250)})
+    current = np.array([4e-3, 12e-3, 20e-3], dtype=np.float32)
+    converted = converter.convert('PT1', current)
+    assert converted is current and current.dtype == np.float32
+    np.testing.assert_allclose(current, [-14.7, 15.15, 45.0], rtol=1e-5)
+
+    volts = np.array([1.0, 5.0])  # across a 250 Ohm shunt, 4 and 20 mA
+    out = np.empty(2)
+    converter.convert('PT2', volts, out=out)
+    np.testing.assert_allclose(out, [0.0, 100.0], atol=1e-9)
+    np.testing.assert_array_equal(volts, [1.0, 5.0])
+
+    stack = np.array([[4e-3, 20e-3], [1.0, 5.0]])
+    np.testing.assert_allclose(converter.convert_stack(['PT1', 'PT2'], stack, block_size=1),
+                               [[-14.7, 45.0], [0.0, 100.0]], atol=1e-9)
+
+
+# unit conversions
+
+def test_unit_conversions_match_the_plain_formulas():
+    temp = np.linspace(200.0, 400.0, BLOCK_SIZE * 2 + 3)  # several blocks and a partial one
+    np.testing.assert_allclose(K_to_C(temp), temp - 272.15)
+    assert Pa_to_psi(6894.76) == pytest.approx(1.0)
+    # a fused chain sweeps the data once and gives the same values as the steps
+    x = np.linspace(0, 0.03, 1_000)
+    to_ml = chain(Linear(3.1e-4), mmm_to_ml)
+    np.testing.assert_allclose(to_ml(x), mmm_to_ml(x * 3.1e-4))
+    np.testing.assert_allclose(K_to_C.then(C_to_K)(temp), temp)
+
+
+def test_unit_conversions_in_place_and_float32():
+    values = np.arange(10, dtype=np.float32)
+    converted = psi_to_Pa(values, out=values)
+    assert converted is values and values.dtype == np.float32
+    np.testing.assert_allclose(values, np.arange(10) * 6894.76, rtol=1e-6)
+    assert psi_to_Pa(np.ones(3, dtype=np.float32)).dtype == np.float32
+    original = np.arange(5.0)
+    assert K_to_C(original) is not original and original.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+# atomic writes
+
+def test_atomic_write_threads_do_not_mix_their_files(tmp_path):
+    target = tmp_path.joinpath('fits.json')
+    barrier = threading.Barrier(8)
+
+    def write(index):
+        with atomic_write(target, 'w') as file:
+            barrier.wait()
+            file.write(str(index) * 100_000)
+
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text = target.read_text()
+    assert len(text) == 100_000 and len(set(text)) == 1
+    assert os.listdir(tmp_path) == ['fits.json']
+
+
+def test_atomic_write_failure_keeps_the_old_file(tmp_path):
+    target = tmp_path.joinpath('sweep.npz')
+    target.write_bytes(b'old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(target) as file:
+            file.write(b'new, half written')
+            raise RuntimeError('interrupted')
+    assert target.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['sweep.npz']
+
+
+# plot export
+
+def test_export_plots_only_renders_changed_plots(tmp_path):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    temp = np.linspace(283.0, 323.0, 5)
+    config = Accumulator('DTB', 3.1e-4, 2000, 10, 0.9, 0.03, 5e-6, 1, [0.3], [4e-4])
+    results = solve_accumulators([config], temp, 20)
+    jobs = [PlotJob('Pressure', plot_spring_pressure, (results, config.A_bore)),
+            PlotJob('MaxFlowRate', plot_max_flow_rate, (results['DTB'], temp), {'title': 'DTB'})]
+
+    first = export_plots(jobs, tmp_path, dpi=50, workers=2)
+    assert [result.rendered for result in first] == [True, True]
+    assert sorted(os.listdir(tmp_path)) == ['.plot_hashes.json', 'Plot_MaxFlowRate.png', 'Plot_Pressure.png']
+    assert [result.rendered for result in export_plots(jobs, tmp_path, dpi=50)] == [False, False]
+
+    jobs[1] = jobs[1]._replace(kwargs={'title': 'DTB, new data'})
+    assert [result.rendered for result in export_plots(jobs, tmp_path, dpi=50)] == [False, True]
+    tmp_path.joinpath('Plot_Pressure.png').unlink()
+    assert [result.rendered for result in export_plots(jobs, tmp_path, dpi=50)] == [True, False]
+
+
+# decimation
+
+def test_minmax_decimation_keeps_the_extremes_of_every_bucket():
+    rng = np.random.default_rng(20)
+    y = rng.normal(size=100_003)
+    y[[17, 50_000, 99_999]] = [40.0, -55.0, 33.0]  # spikes a plot must not lose
+    decimator = MinMaxDecimator(len(y), buckets=100)
+    for start in range(0, len(y), 7_919):  # chunks that do not line up with the buckets
+        decimator.update(y[start:start + 7_919])
+    x, kept = decimator.result()
+
+    np.testing.assert_array_equal(kept, y[x])
+    assert np.all(np.diff(x) > 0)
+    for start in range(0, len(y), decimator.width):
+        bucket = kept[(x >= start) & (x < start + decimator.width)]
+        assert bucket.min() == y[start:start + decimator.width].min()
+        assert bucket.max() == y[start:start + decimator.width].max()
+    np.testing.assert_array_equal(minmax(y, buckets=100)[1], kept)
+
+
+def test_decimate_tdms_matches_the_array_in_memory(tmp_path):
+    y = np.sin(np.linspace(0, 60, 30_000)) + np.linspace(0, 1, 30_000)
+    paths = [write_tdms(tmp_path.joinpath(f'part_{index}.tdms'), {('Data', 'Pressure'): part})
+             for index, part in enumerate(np.array_split(y, 3))]
+    x, kept = decimate_tdms(paths, ('Data', 'Pressure'), buckets=64)
+    expected_x, expected = minmax(y, buckets=64)
+    np.testing.assert_array_equal(x, expected_x)
+    np.testing.assert_array_equal(kept, expected)
+
+
+# streaming Savitzky-Golay
+
+@pytest.mark.parametrize('mode', ['interp', 'mirror', 'nearest', 'constant'])
+def test_streaming_savgol_matches_the_whole_array(mode):
+    rng = np.random.default_rng(21)
+    y = np.cumsum(rng.normal(size=20_011))
+    stream = SavgolStream(51, 3, deriv=(0, 1), delta=0.01, mode=mode)
+    outputs = [stream.update(y[start:start + 1_237]) for start in range(0, len(y), 1_237)]
+    outputs.append(stream.finish())
+    for order, deriv in enumerate((0, 1)):
+        expected = savgol_filter(y, 51, 3, deriv=deriv, delta=0.01, mode=mode)
+        np.testing.assert_allclose(np.concatenate([output[order] for output in outputs]), expected,
+                                   rtol=1e-9, atol=1e-9)
+
+
+def test_savgol_chunks_with_chunks_shorter_than_the_window():
+    y = np.sin(np.linspace(0, 20, 1_000))
+    chunks = [y[start:start + 10] for start in range(0, len(y), 10)]
+    np.testing.assert_allclose(np.concatenate(list(savgol_chunks(chunks, 101, 2))), savgol_filter(y, 101, 2),
+                               rtol=1e-9, atol=1e-12)
+
+
+# typed CSV loading
+
+def test_read_csv_cache_round_trips_the_dtypes(tmp_path, monkeypatch):
+    path = tmp_path.joinpath('log.csv')
+    path.write_text('temp_K,mu_kg/m/s,run,valve_open,time\n'
+                    '300,0.1,a,True,2026-01-01 10:00\n'
+                    '310,,b,False,2026-01-01 10:01\n'
+                    '320,0.3,,True,2026-01-01 10:02\n')
+    options = {'dropna': False, 'parse_dates': ['time'], 'dtype': {'temp_K': 'float32'}}
+    parsed = read_csv(path, **options)
+    assert cache_path(path).exists()
+
+    def parse(*args, **kwargs):
+        raise AssertionError('the CSV was parsed again')
+    monkeypatch.setattr(tables, 'parse_csv', parse)
+    cached = read_csv(path, **options)
+    pd.testing.assert_frame_equal(cached, parsed)
+    assert cached['temp_K'].dtype == np.float32 and cached['valve_open'].dtype == bool
+
+
+def test_read_csv_reparses_a_changed_or_unreadable_cache(tmp_path):
+    path = tmp_path.joinpath('viscosity.csv')
+    path.write_text('temp_K,mu_kg/m/s\n300,0.1\n310,0.2\n')
+    assert read_csv(path, VISCOSITY_SCHEMA)['mu_kg/m/s'].tolist() == [0.1, 0.2]
+    path.write_text('temp_K,mu_kg/m/s\n300,0.1\n310,0.2\n320,0.3\n')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert read_csv(path, VISCOSITY_SCHEMA)['mu_kg/m/s'].tolist() == [0.1, 0.2, 0.3]
+    cache_path(path).write_bytes(b'not a cache')
+    assert len(read_csv(path, VISCOSITY_SCHEMA)) == 3
+
+
+def test_read_csv_passes_the_separator_to_pandas(tmp_path):
+    path = tmp_path.joinpath('logger.txt')
+    path.write_text('time\tpressure\n0.0\t14.7\n0.1\t15.2\n')
+    tabbed = read_csv(path, sep='\t')
+    assert list(tabbed.columns) == ['time', 'pressure'] and tabbed['pressure'].tolist() == [14.7, 15.2]
+    pd.testing.assert_frame_equal(read_csv(path, delimiter='\t', cache=False), tabbed)
+    # the cached tab separated parse is not returned for another separator
+    assert list(read_csv(path).columns) == ['time\tpressure']
+    pd.testing.assert_frame_equal(read_csv(path, sep='\t'), tabbed)
+
+
+# accumulator configurations
+
+def test_load_accumulators_needs_every_value_filled_in(tmp_path):
+    path = tmp_path.joinpath('accumulators.csv')
+    header = ','.join(Accumulator._fields) + '\n'
+    path.write_text(header)
+    assert load_accumulators(path) == []
+    path.write_text(header + 'DTB,3.1e-4,2000,10,0.9,0.03,5e-6,1,0.3;0.2,4e-4;5e-4\n\nUTB,3.1e-4,,10,0.9,0.03,5e-6,1,0.3,\n')
+    with pytest.raises(ValueError, match='line 4: fill in keff, R_lines'):
+        load_accumulators(path)
+    path.write_text(header + 'DTB,3.1e-4,2000,10,0.9,0.03,5e-6,1,0.3;0.2,4e-4;5e-4\n')
+    (config,) = load_accumulators(path)
+    assert config.name == 'DTB' and config.L_lines == [0.3, 0.2] and config.R_lines == [4e-4, 5e-4]
+    with pytest.raises(FileNotFoundError):
+        load_accumulators(tmp_path.joinpath('missing.csv'))
+
+
+# design sweeps
+
+def test_sweep_reuses_saved_points(tmp_path):
+    path = tmp_path.joinpath('R_h_sweep.npz')
+    temp = np.array([280.0, 300.0, 320.0])
+    axes = dict(N_valve=[1, 2], L_line=[0.1, 0.2], R_line=[0.25e-3, 0.5e-3])
+    first = sweep_R_h(temp, path=path, workers=2, chunk_size=5, **axes)
+    assert first.computed == 24
+
+    again = sweep_R_h(temp, path=path, **axes)
+    assert again.computed == 0
+    np.testing.assert_array_equal(again.R_h, first.R_h)
+
+    wider = sweep_R_h(np.append(temp, 340.0), path=path, **axes)
+    assert wider.computed == 8
+    np.testing.assert_array_equal(wider.R_h[:3], first.R_h)
+    expected = R_h_model(EMIBF4.model('mu', 340.0), 2, np.array([0.2]), np.array([0.5e-3]))
+    assert wider.R_h[3, 1, 1, 1] == pytest.approx(float(expected))
+
+    # another fluid is a new sweep
+    other = FluidProperties('EMIBF2', {key: value * 1.1 for key, value in EMIBF4.coefficients.items()})
+    assert sweep_R_h(temp, fluid=other, path=path, **axes).computed == 24
+
+
+# curve families
+
+def test_plot_family_draws_every_curve_as_one_artist():
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    x = np.linspace(0, 30, 50)
+    temp = np.linspace(15, 49, 35)
+    Y = np.outer(temp, x)
+    fig, ax = plt.subplots()
+    lines, colorbar = plot_family(ax, x, Y, temp, label='Temperature')
+    try:
+        assert list(ax.collections) == [lines] and not ax.lines
+        assert len(lines.get_segments()) == 35
+        np.testing.assert_allclose(lines.get_segments()[7], np.column_stack([x, Y[7]]))
+        assert colorbar.mappable is lines and (lines.norm.vmin, lines.norm.vmax) == (15, 49)
+        with pytest.raises(ValueError):
+            plot_family(ax, x, Y, temp[:-1])
+    finally:
+        plt.close(fig)
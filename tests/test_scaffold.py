@@ -0,0 +1,240 @@
+# coding: utf-8
+'''Filesystem guarantees of the scaffold engine, checked in temporary folders.'''
+
+# import liberaries
+import errno
+import json
+import os
+import re
+import shutil
+import threading
+
+import pytest
+
+import scaffold
+
+from scaffold import Experiment, LocalFS, build_experiment, plan_experiment
+from structure_profiles import ProfileError, load_profile
+from template_store import TEMPLATES
+
+
+def make_experiment(tmp_path, **options):
+    master = tmp_path.joinpath('master')
+    master.mkdir(exist_ok=True)
+    return Experiment(str(master), '2026-01-01', 'test run', **options)
+
+
+def planned_paths(plan):
+    return ({plan.root} | set(plan.directories) | {target for _, target in plan.copies}
+            | {target for target, _ in plan.writes})
+
+
+def tree(root):
+    '''Returns {relative path: file bytes or None for folders} under root.'''
+    found = {}
+    for folder, folders, files in os.walk(root):
+        for name in folders:
+            found[os.path.relpath(os.path.join(folder, name), root)] = None
+        for name in files:
+            path = os.path.join(folder, name)
+            with open(path, 'rb') as file:
+                found[os.path.relpath(path, root)] = file.read()
+    return found
+
+
+# plans
+
+def test_plan_has_no_duplicate_or_redundant_operations(tmp_path):
+    profile = load_profile()
+    # repeated keys, a child selected with its parent and file options sharing folders
+    folders = profile.default_folders + ('images', 'images/JPG', 'notebooks', 'misc', 'misc')
+    # the notebook and the python script both copy the exptools package
+    files = profile.default_files + tuple(profile.default_files) + ('notebook', 'python')
+    experiment = make_experiment(tmp_path, folders=folders, files=files)
+    plan = plan_experiment(experiment)
+
+    assert len(set(plan.directories)) == len(plan.directories)
+    assert plan.root not in plan.directories
+    targets = [target for _, target in plan.copies] + [target for target, _ in plan.writes]
+    assert len(set(targets)) == len(targets)
+    assert not set(targets) & set(plan.directories)
+    # parents are created before their children and every file has its folder
+    for index, path in enumerate(plan.directories):
+        assert path.parent == plan.root or path.parent in plan.directories[:index]
+    for target in targets:
+        assert target.parent == plan.root or target.parent in plan.directories
+    assert plan.operations == len(planned_paths(plan))
+    helpers = [name for name, _ in plan.copies if name.startswith('exptools/')]
+    assert '__init__.py' in {name.split('/')[-1] for name in helpers} and len(helpers) == len(set(helpers))
+
+
+def test_start_files_bring_their_helpers(tmp_path):
+    # every exptools module a start file imports is copied along with it
+    for key, template in (('notebook', '_notebook.ipynb'), ('python', '_py_script.py')):
+        text = TEMPLATES.folder.joinpath(template).read_text(encoding='utf-8')
+        modules = set(re.findall(r'from exptools\.(\w+) import', text))
+        modules.update(*[re.findall(r'\w+', names) for names in re.findall(r'from exptools import ([\w, ]+)', text)])
+        assert modules
+        # and the modules those import
+        pending = set(modules)
+        while pending:
+            source = TEMPLATES.folder.joinpath('exptools', f'{pending.pop()}.py').read_text(encoding='utf-8')
+            imported = set(re.findall(r'from \.(\w+) import', source)) - modules
+            modules |= imported
+            pending |= imported
+        plan = plan_experiment(make_experiment(tmp_path, files=(key,)))
+        copied = {name for name, _ in plan.copies}
+        assert {'exptools/__init__.py'} | {f'exptools/{module}.py' for module in modules} <= copied
+
+
+def test_plan_rejects_missing_template(tmp_path):
+    profile_path = tmp_path.joinpath('broken.json')
+    profile_path.write_text(json.dumps({'files': [
+        {'key': 'missing', 'default': True, 'copies': [{'template': 'no_such_template.txt'}]}]}))
+    experiment = make_experiment(tmp_path, profile=str(profile_path))
+    with pytest.raises(ProfileError, match='no_such_template.txt'):
+        plan_experiment(experiment)
+
+
+def test_default_profile_builds(tmp_path):
+    experiment = make_experiment(tmp_path)
+    result = build_experiment(experiment)
+    assert result.ok, result.errors
+    assert set(result.created) == planned_paths(plan_experiment(experiment))
+
+
+# repair
+
+def test_repair_never_overwrites_edited_files(tmp_path):
+    experiment = make_experiment(tmp_path)
+    plan = plan_experiment(experiment)
+    assert build_experiment(experiment).ok
+
+    notebook = next(target for name, target in plan.copies if name == '_notebook.ipynb')
+    note = plan.writes[0][0]
+    notebook.write_text('edited notebook')
+    note.write_text('edited notes')
+    removed_file = next(target for name, target in plan.copies if name == 'video_scripts.txt')
+    removed_file.unlink()
+    removed_folder = experiment.path.joinpath('images', 'PNG')
+    removed_folder.rmdir()
+
+    result = build_experiment(experiment)
+    assert result.ok, result.errors
+    assert set(result.created) == {removed_file, removed_folder}
+    assert notebook.read_text() == 'edited notebook'
+    assert note.read_text() == 'edited notes'
+    assert removed_file.exists() and removed_folder.is_dir()
+
+    # a complete tree is left as it is
+    before = tree(experiment.path)
+    result = build_experiment(experiment)
+    assert result.ok and result.created == []
+    assert tree(experiment.path) == before
+
+
+# staged builds
+
+def test_staged_build_publishes_complete_tree(tmp_path):
+    staging = tmp_path.joinpath('staging')
+    staging.mkdir()
+    experiment = make_experiment(tmp_path)
+    result = build_experiment(experiment, stage=True, staging_folder=staging)
+    assert result.ok, result.errors
+    assert set(result.created) == planned_paths(plan_experiment(experiment))
+
+    direct_master = tmp_path.joinpath('direct')
+    direct_master.mkdir()
+    direct = Experiment(str(direct_master), experiment.date, experiment.name)
+    assert build_experiment(direct).ok
+    assert tree(experiment.path) == tree(direct.path)
+    assert os.listdir(staging) == []
+
+
+def test_staged_build_failure_leaves_nothing(tmp_path, monkeypatch):
+    staging = tmp_path.joinpath('staging')
+    staging.mkdir()
+    experiment = make_experiment(tmp_path)
+    place = LocalFS.place
+
+    def failing_place(self, templates, name, target):
+        if name == 'video_scripts.txt':
+            raise OSError(errno.EIO, 'simulated failure', str(target))
+        return place(self, templates, name, target)
+
+    monkeypatch.setattr(LocalFS, 'place', failing_place)
+    result = build_experiment(experiment, stage=True, staging_folder=staging)
+    assert not result.ok and result.created == []
+    assert os.listdir(experiment.master_folder) == []
+    assert os.listdir(staging) == []
+
+
+def test_staged_build_cancel_leaves_nothing(tmp_path):
+    staging = tmp_path.joinpath('staging')
+    staging.mkdir()
+    experiment = make_experiment(tmp_path)
+    cancel = threading.Event()
+
+    def progress(done, total, description):
+        if done == 5:
+            cancel.set()
+
+    result = build_experiment(experiment, progress=progress, cancel=cancel, stage=True, staging_folder=staging)
+    assert result.cancelled and result.created == []
+    assert os.listdir(experiment.master_folder) == []
+    assert os.listdir(staging) == []
+
+
+class CrossVolumeFS(LocalFS):
+    '''Acts as if staging and master folder are on different volumes. copytree can be made to fail half way.'''
+
+    def __init__(self, fail_copy=False):
+        self.fail_copy = fail_copy
+
+    def rename(self, source, target):
+        if not os.path.basename(source).startswith('.'):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        super().rename(source, target)
+
+    def copytree(self, source, target):
+        if self.fail_copy:
+            shutil.copytree(os.path.join(source, 'notebooks'), os.path.join(target, 'notebooks'))
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        super().copytree(source, target)
+
+
+def test_cross_volume_publish_is_complete(tmp_path):
+    staging = tmp_path.joinpath('staging')
+    staging.mkdir()
+    experiment = make_experiment(tmp_path)
+    result = build_experiment(experiment, stage=True, staging_folder=staging, fs=CrossVolumeFS())
+    assert result.ok, result.errors
+    assert set(result.created) == planned_paths(plan_experiment(experiment))
+    assert os.listdir(experiment.master_folder) == [experiment.kernal]
+    assert os.listdir(staging) == []
+
+
+def test_cross_volume_publish_failure_leaves_nothing(tmp_path):
+    staging = tmp_path.joinpath('staging')
+    staging.mkdir()
+    experiment = make_experiment(tmp_path)
+    result = build_experiment(experiment, stage=True, staging_folder=staging, fs=CrossVolumeFS(fail_copy=True))
+    assert not result.ok and result.created == []
+    assert os.listdir(experiment.master_folder) == []
+    assert os.listdir(staging) == []
+
+
+def test_staged_build_with_missing_template_never_stages(tmp_path, monkeypatch):
+    staging = tmp_path.joinpath('staging')
+    staging.mkdir()
+    profile_path = tmp_path.joinpath('broken.json')
+    profile_path.write_text(json.dumps({'folders': [{'name': 'data', 'default': True}], 'files': [
+        {'key': 'missing', 'default': True, 'copies': [{'template': 'no_such_template.txt'}]}]}))
+    experiment = make_experiment(tmp_path, profile=str(profile_path))
+    staged = []
+    mkdtemp = scaffold.tempfile.mkdtemp
+    monkeypatch.setattr(scaffold.tempfile, 'mkdtemp', lambda **kwargs: staged.append(kwargs) or mkdtemp(**kwargs))
+    result = build_experiment(experiment, stage=True, staging_folder=staging)
+    assert not result.ok and 'no_such_template.txt' in result.errors[0]
+    assert staged == []
+    assert os.listdir(experiment.master_folder) == []